@@ -5,7 +5,6 @@ import requests
 import schedule
 from datetime import datetime
 from config import KRAKEN_API_KEY, KRAKEN_API_SECRET, GEMINI_API_KEY
-from db import reset_daily_signals
 
 logger = logging.getLogger(__name__)
 
@@ -78,12 +77,3 @@ def start_api_checker():
     while True:
         schedule.run_pending()
         time.sleep(3600)  # Перевіра кожну годину
-
-def schedule_daily_reset():
-    """Планує щоденний скид сигналів о 8:00 UTC"""
-    schedule.every().day.at("08:00").do(reset_daily_signals)
-    logger.info("✅ Daily signal reset scheduled for 08:00 UTC")
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import db
+import payments
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve(fut, result, error):
+    # Виконується в event loop; запит міг бути скасований, поки чекав у черзі
+    if fut.done():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(result)
+
+
+class DBThread:
+    """Окремий потік для всіх звернень до SQLite з боку event loop.
+    Запити виконуються по черзі, тож записи серіалізовані без змагання за блокування,
+    а корутини лише чекають на asyncio.Future і не блокують loop."""
+
+    def __init__(self, name: str = 'db-thread'):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+                      'wait_total': 0.0, 'wait_max': 0.0, 'run_total': 0.0, 'run_max': 0.0}
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        """Ставить fn(*args, **kwargs) у чергу потоку БД, повертає Future поточного loop"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._ensure_started()
+        with self._lock:
+            self.stats['submitted'] += 1
+        self._queue.put((loop, fut, fn, args, kwargs, time.monotonic()))
+        return fut
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            loop, fut, fn, args, kwargs, queued = item
+            if fut.cancelled():
+                with self._lock:
+                    self.stats['cancelled'] += 1
+                continue
+            started = time.monotonic()
+            result = error = None
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+            finished = time.monotonic()
+            with self._lock:
+                self.stats['failed' if error else 'completed'] += 1
+                self.stats['wait_total'] += started - queued
+                self.stats['run_total'] += finished - started
+                self.stats['wait_max'] = max(self.stats['wait_max'], started - queued)
+                self.stats['run_max'] = max(self.stats['run_max'], finished - started)
+            try:
+                loop.call_soon_threadsafe(_resolve, fut, result, error)
+            except RuntimeError:
+                pass  # loop вже закрито — відповідь нікому не потрібна
+        # Лише власне з'єднання: потоки відкладених записів db.py можуть бути посеред пакета
+        db.close_connection()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats, pending=self._queue.qsize())
+        done = (stats['completed'] + stats['failed']) or 1
+        stats['wait_avg'] = stats['wait_total'] / done
+        stats['run_avg'] = stats['run_total'] / done
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Дочікується вже поставлених запитів і зупиняє потік"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        if wait:
+            thread.join()
+        self._thread = None
+
+
+_db_thread = DBThread()
+
+
+async def run(fn, *args, **kwargs):
+    """Виконати будь-яку синхронну функцію БД у потоці БД"""
+    return await _db_thread.submit(fn, *args, **kwargs)
+
+
+# Асинхронні відповідники функцій db.py (ті самі аргументи й результати)
+
+async def get_user(chat_id):
+    return await run(db.get_user, chat_id)
+
+
+async def get_signals_available(chat_id):
+    return await run(db.get_signals_available, chat_id)
+
+
+async def set_plan(chat_id, plan, expires_ts=None, signals_daily=None):
+    return await run(db.set_plan, chat_id, plan, expires_ts, signals_daily)
+
+
+async def decrement_signal(chat_id, amount: int = 1):
+    return await run(db.decrement_signal, chat_id, amount)
+
+
+async def get_broadcast_recipients(plans):
+    return await run(db.get_broadcast_recipients, list(plans))
+
+
+async def consume_signals(chat_ids):
+    return await run(db.consume_signals, list(chat_ids))
+
+
+async def create_payment(chat_id, plan, amount, crypto, payment_code):
+    return await run(db.create_payment, chat_id, plan, amount, crypto, payment_code)
+
+
+async def get_payment(payment_code):
+    return await run(db.get_payment, payment_code)
+
+
+async def update_payment(payment_code, status, screenshot_url=None, location=None):
+    return await run(db.update_payment, payment_code, status, screenshot_url, location)
+
+
+async def get_pending_payments():
+    return await run(db.get_pending_payments)
+
+
+async def track_user(user_id, username, first_name):
+    return await run(db.track_user, user_id, username, first_name)
+
+
+async def find_tracked_user(query):
+    return await run(db.find_tracked_user, query)
+
+
+async def get_recent_users(limit=20):
+    return await run(db.get_recent_users, limit)
+
+
+async def add_scheduled_delivery(chat_id, due_at):
+    return await run(db.add_scheduled_delivery, chat_id, due_at)
+
+
+async def remove_scheduled_deliveries(chat_ids):
+    return await run(db.remove_scheduled_deliveries, list(chat_ids))
+
+
+async def get_scheduled_deliveries():
+    return await run(db.get_scheduled_deliveries)
+
+
+async def purchase_plan(chat_id: int, plan_key: str):
+    return await run(payments.purchase_plan, chat_id, plan_key)
+
+
+def get_stats() -> dict:
+    return _db_thread.get_stats()
+
+
+def shutdown(wait: bool = True):
+    _db_thread.shutdown(wait=wait)
+    logger.info("✅ DB thread stopped")
@@ -0,0 +1,117 @@
+"""Бенчмарк рендеру графіка: шаблонний ChartRenderer проти старого pyplot-варіанту.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.chart [--runs 30] [--rows 300]
+
+Кожен варіант виконується в окремому процесі, щоб пікова RSS не змішувалась.
+"""
+import argparse
+import multiprocessing
+import resource
+import statistics
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_ohlcv(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 50, rows))
+    spread = rng.random(rows) * 80
+    return pd.DataFrame({
+        'ts': pd.date_range('2024-01-01', periods=rows, freq='h'),
+        'open': close, 'high': close + spread, 'low': close - spread,
+        'close': close, 'volume': rng.random(rows) * 10,
+    })
+
+
+def legacy_chart_image(df: pd.DataFrame):
+    """generate_chart_image до появи chart_renderer (нова фігура через pyplot на кожен виклик)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(df['ts'], df['close'], linewidth=2.5, color='#00BCD4', label='Ціна')
+    ax.fill_between(df['ts'], df['low'], df['high'], alpha=0.1, color='#00BCD4')
+    ax.set_ylabel('Ціна (USDT)', fontsize=11, fontweight='bold')
+    ax.set_xlabel('Час', fontsize=11, fontweight='bold')
+    ax.set_title('Аналіз ринку в реальному часі', fontsize=13, fontweight='bold')
+    ax.grid(True, alpha=0.2, linestyle='--')
+    ax.legend(fontsize=10)
+
+    fig.patch.set_facecolor('#1a1a1a')
+    ax.set_facecolor('#0d0d0d')
+    ax.tick_params(colors='#ffffff')
+    ax.xaxis.label.set_color('#ffffff')
+    ax.yaxis.label.set_color('#ffffff')
+    ax.title.set_color('#ffffff')
+
+    buf = BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format='png', dpi=100, facecolor='#1a1a1a')
+    buf.seek(0)
+    plt.close(fig)
+    return buf
+
+
+def template_chart_image(df: pd.DataFrame):
+    from chart_renderer import render_png
+    return BytesIO(render_png(df))
+
+
+VARIANTS = {'legacy': legacy_chart_image, 'template': template_chart_image}
+
+
+def _run_variant(name, runs, rows, out):
+    render = VARIANTS[name]
+    frames = [synthetic_ohlcv(rows, seed) for seed in range(runs)]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    first = time.perf_counter()
+    render(frames[0])
+    first = time.perf_counter() - first
+    timings = []
+    size = 0
+    for df in frames:
+        started = time.perf_counter()
+        size = len(render(df).getvalue())
+        timings.append(time.perf_counter() - started)
+    out.put({
+        'variant': name,
+        'first_ms': first * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': sorted(timings)[int(len(timings) * 0.95) - 1] * 1000,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'rss_growth_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+        'png_kb': size / 1024,
+    })
+
+
+def run(runs: int = 30, rows: int = 300) -> list:
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for name in VARIANTS:
+        out = ctx.Queue()
+        proc = ctx.Process(target=_run_variant, args=(name, runs, rows, out))
+        proc.start()
+        results.append(out.get())
+        proc.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'variant':<10} {'first ms':>9} {'median ms':>10} {'p95 ms':>8} {'peak RSS MB':>12} {'RSS +MB':>8} {'PNG KB':>7}")
+    for r in run(args.runs, args.rows):
+        print(f"{r['variant']:<10} {r['first_ms']:>9.1f} {r['median_ms']:>10.1f} {r['p95_ms']:>8.1f} "
+              f"{r['peak_rss_mb']:>12.1f} {r['rss_growth_mb']:>8.1f} {r['png_kb']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
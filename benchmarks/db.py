@@ -0,0 +1,108 @@
+"""Бенчмарк db.py: нове з'єднання на кожен виклик проти довгоживучих WAL-з'єднань.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.db [--ops 2000] [--threads 4]
+
+legacy і pooled обходять кеш користувачів і write-behind (кожен виклик іде в SQLite),
+тож різниця між ними — лише вартість з'єднання; cached — pooled з кешем і відкладеним записом.
+Кожен варіант працює з власною тимчасовою БД, робоча bot_data.db не зачіпається.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+
+import db
+
+
+@contextmanager
+def _legacy_connection():
+    """Поведінка db.py до появи менеджера з'єднань"""
+    with closing(sqlite3.connect(db.DB)) as conn:
+        yield conn
+
+
+# Варіант -> (менеджер з'єднань, чи працюють кеш користувачів і write-behind)
+VARIANTS = {
+    'legacy': (_legacy_connection, False),
+    'pooled': (db._connection, False),
+    'cached': (db._connection, True),
+}
+
+
+def _workload(chat_ids, ops, prefix, cached):
+    """Типовий набір викликів «отримати сигнал» + платіж"""
+    for i in range(ops):
+        chat_id = chat_ids[i % len(chat_ids)]
+        if not cached:
+            db._user_cache.pop(chat_id)
+        db.get_user(chat_id)
+        if not cached:
+            db._user_cache.pop(chat_id)
+        db.get_signals_available(chat_id)
+        if not cached:
+            db._user_cache.pop(chat_id)
+        db.decrement_signal(chat_id)
+        if not cached:
+            db._usage.flush()  # запис одразу, як до write-behind
+        if i % 10 == 0:
+            code = f'{prefix}-{i}'
+            db.create_payment(chat_id, 'basic', 10.0, 'USDT', code)
+            db.get_payment(code)
+            db.set_plan(chat_id, 'basic', int(time.time()) + 86400, 10)
+
+
+def _calls_per_op(ops):
+    return ops * 3 + (ops + 9) // 10 * 3
+
+
+def run_variant(name, ops, threads):
+    tmpdir = tempfile.mkdtemp(prefix=f'bench-db-{name}-')
+    saved = db.DB, db._connection
+    db.DB = os.path.join(tmpdir, 'bench.db')
+    db._connection, cached = VARIANTS[name]
+    db._user_cache.clear()
+    try:
+        db.init_db()
+        chat_ids = list(range(1000, 1050))
+        for chat_id in chat_ids:
+            db.set_plan(chat_id, 'basic', int(time.time()) + 86400, 10)
+
+        per_thread = ops // threads
+        workers = [threading.Thread(target=_workload, args=(chat_ids, per_thread, f'{name}-{n}', cached))
+                   for n in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        calls = _calls_per_op(per_thread) * threads
+        return {'variant': name, 'calls': calls, 'seconds': elapsed, 'ops_per_sec': calls / elapsed}
+    finally:
+        db.flush_pending()
+        db.close_connections()
+        db._user_cache.clear()
+        db.DB, db._connection = saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'variant':<8} {'calls':>7} {'seconds':>8} {'ops/sec':>9}")
+    results = [run_variant(name, args.ops, args.threads) for name in VARIANTS]
+    for r in results:
+        print(f"{r['variant']:<8} {r['calls']:>7} {r['seconds']:>8.2f} {r['ops_per_sec']:>9.0f}")
+    base = results[0]['ops_per_sec']
+    for r in results[1:]:
+        print(f"speedup {r['variant']} vs {results[0]['variant']}: {r['ops_per_sec'] / base:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""Навантажувальний тест обробників бота віртуальними користувачами, без Telegram і мережі.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.load_bot [--users 1000] [--mix buy=0.3,signal=0.4,status=0.3]
+                                  [--think 0.0] [--ramp 1.0] [--api-latency 0.0] [--json]
+
+Кожен користувач проходить сценарій через справжні start / callback_router / handle_message
+з синтетичними Update, а фейковий бот записує всі відправки. Наступна кнопка береться
+з розмітки останньої відповіді, як у клієнті Telegram. Помилка обробника — виняток
+або ERROR-запис у лог bot (обробники ловлять винятки самі). БД — тимчасова.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import db
+from loop_monitor import callback_prefix
+
+# ERROR-записи логера bot, що з'явились під час поточного виклику обробника
+_call_errors = contextvars.ContextVar('call_errors', default=None)
+
+
+class _ErrorCollector(logging.Handler):
+    def emit(self, record):
+        errors = _call_errors.get()
+        if errors is not None:
+            errors.append(record.getMessage())
+
+
+class FakeBot:
+    """Записує відправки замість запитів до Bot API; api_latency імітує час відповіді"""
+
+    def __init__(self, api_latency: float = 0.0):
+        self.api_latency = api_latency
+        self.rate_limiter = None
+        self.sent = defaultdict(int)
+
+    async def _call(self, method: str):
+        self.sent[method] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call('send_message')
+        return SimpleNamespace(chat_id=chat_id, text=text, reply_markup=kwargs.get('reply_markup'))
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        await self._call('send_photo')
+        return SimpleNamespace(chat_id=chat_id, caption=caption, photo=[SimpleNamespace(file_id='fake-file-id')])
+
+
+class FakeMessage:
+    def __init__(self, user, bot: FakeBot, on_reply, text=None, photo=None, caption=None):
+        self.from_user = user
+        self.text = text
+        self.photo = photo or []
+        self.caption = caption
+        self._bot = bot
+        self._on_reply = on_reply
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        await self._bot._call('reply_text')
+        self._on_reply(text, reply_markup)
+
+
+class FakeQuery:
+    def __init__(self, user, data: str, bot: FakeBot, on_reply):
+        self.from_user = user
+        self.data = data
+        self._bot = bot
+        self._on_reply = on_reply
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        await self._bot._call('answer_callback_query')
+
+    async def edit_message_text(self, text, reply_markup=None, **kwargs):
+        await self._bot._call('edit_message_text')
+        self._on_reply(text, reply_markup)
+
+
+class VirtualUser:
+    """Один користувач: user_data між викликами, остання відповідь і її кнопки"""
+
+    def __init__(self, harness, user_id: int):
+        self.h = harness
+        self.user = SimpleNamespace(id=user_id, username=f'user{user_id}', first_name='Load', is_bot=False)
+        self.context = SimpleNamespace(bot=harness.fake_bot, user_data={}, bot_data={},
+                                       application=SimpleNamespace(create_task=asyncio.ensure_future))
+        self.last_text = ''
+        self.buttons = []
+
+    def _on_reply(self, text, markup):
+        self.last_text = text
+        self.buttons = [b.callback_data for row in getattr(markup, 'inline_keyboard', ()) for b in row
+                        if getattr(b, 'callback_data', None)]
+
+    def button(self, prefix: str):
+        """callback_data першої кнопки з відповіді, що починається з prefix"""
+        for data in self.buttons:
+            if data.startswith(prefix):
+                return data
+        return None
+
+    async def start(self):
+        message = FakeMessage(self.user, self.h.fake_bot, self._on_reply, text='/start')
+        update = SimpleNamespace(effective_user=self.user, message=message, callback_query=None)
+        await self.h.call('start', self.h.bot.start, update, self.context)
+
+    async def press(self, data: str):
+        if data is None:
+            self.h.stats['missing_button'] += 1
+            return False
+        query = FakeQuery(self.user, data, self.h.fake_bot, self._on_reply)
+        update = SimpleNamespace(effective_user=self.user, callback_query=query, message=None)
+        await self.h.call(f'callback_router:{callback_prefix(data)}', self.h.bot.callback_router, update, self.context)
+        return True
+
+    async def send(self, text=None, photo=False, caption=None):
+        state = self.context.user_data.get('state') or 'none'
+        photos = [SimpleNamespace(file_id=f'photo-{self.user.id}')] if photo else None
+        message = FakeMessage(self.user, self.h.fake_bot, self._on_reply, text=text, photo=photos, caption=caption)
+        update = SimpleNamespace(effective_user=self.user, message=message, callback_query=None)
+        await self.h.call(f'handle_message:{state}', self.h.bot.handle_message, update, self.context)
+
+
+async def script_buy(u: VirtualUser, rng: random.Random):
+    """Купівля: план → термін → спосіб оплати → «Оплачено» → скріншот з кодом"""
+    await u.start()
+    await u.h.think(rng)
+    await u.press('menu:buy')
+    await u.h.think(rng)
+    await u.press(rng.choice(['buy:starter', 'buy:pro']))
+    await u.h.think(rng)
+    await u.press(rng.choice(['term:month', 'term:year']))
+    await u.h.think(rng)
+    await u.press(rng.choice(['crypto:usdt', 'crypto:ton', 'crypto:monobank', 'crypto:monobank_card']))
+    confirm = u.button('payment:confirm:')
+    await u.h.think(rng)
+    if not await u.press(confirm):
+        return
+    await u.h.think(rng)
+    code = confirm.split(':', 2)[2]
+    # Частина користувачів забуває підписати скріншот — валідація не проходить
+    await u.send(photo=True, caption=f'paid {code}' if rng.random() < 0.8 else None)
+
+
+async def script_signal(u: VirtualUser, rng: random.Random):
+    """Отримати сигнал (користувачі з тарифом) і повторне натискання, поки сигнал шукається"""
+    await u.start()
+    await u.h.think(rng)
+    await u.press('menu:signal')
+    await u.h.think(rng)
+    await u.press('menu:signal')
+    await u.press('menu:main')
+
+
+async def script_status(u: VirtualUser, rng: random.Random):
+    await u.start()
+    await u.h.think(rng)
+    await u.press('menu:status')
+    await u.h.think(rng)
+    await u.press('menu:help')
+    await u.press('menu:main')
+
+
+SCRIPTS = {'buy': script_buy, 'signal': script_signal, 'status': script_status}
+
+
+def percentile(samples, p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+
+class Harness:
+    def __init__(self, bot_module, api_latency: float = 0.0, think: float = 0.0):
+        self.bot = bot_module
+        self.fake_bot = FakeBot(api_latency)
+        self.think_max = think
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.samples = {}  # обробник -> приклад помилки
+        self.stats = defaultdict(int)
+
+    async def think(self, rng: random.Random):
+        if self.think_max:
+            await asyncio.sleep(rng.uniform(0, self.think_max))
+
+    async def call(self, label: str, handler, update, context):
+        errors = []
+        token = _call_errors.set(errors)
+        started = time.perf_counter()
+        try:
+            await handler(update, context)
+        except Exception as e:
+            errors.append(f'{type(e).__name__}: {e}')
+        finally:
+            self.latency[label].append(time.perf_counter() - started)
+            _call_errors.reset(token)
+        if errors:
+            self.errors[label] += 1
+            self.samples.setdefault(label, errors[0])
+
+    def report(self) -> dict:
+        handlers = {}
+        for label in sorted(self.latency):
+            samples = self.latency[label]
+            handlers[label] = {
+                'calls': len(samples), 'errors': self.errors[label],
+                'error_rate': self.errors[label] / len(samples),
+                'p50_ms': percentile(samples, 0.50) * 1000, 'p95_ms': percentile(samples, 0.95) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000, 'max_ms': max(samples) * 1000,
+            }
+        return {'handlers': handlers, 'error_samples': self.samples, 'sent': dict(self.fake_bot.sent),
+                'missing_button': self.stats['missing_button']}
+
+
+def _parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCRIPTS:
+            raise SystemExit(f"unknown script: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def run(users: int, mix: dict, think: float, ramp: float, api_latency: float, seed: int) -> dict:
+    import bot
+    from delivery_scheduler import DeliveryScheduler
+
+    delivered = []
+
+    async def fake_deliver(chat_id):
+        delivered.append(chat_id)
+
+    # Планувальник лише зберігає доставки (цикл не запущений — pick_signal і біржа не викликаються)
+    bot.delivery_scheduler = DeliveryScheduler(fake_deliver)
+    harness = Harness(bot, api_latency, think)
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    base_id = 5_000_000
+    expires = int(time.time()) + 30 * 86400
+    # Користувачам сценарію signal видаємо тариф, щоб вони дійшли до планування доставки
+    plan_users = []
+    plan = []
+    for n in range(users):
+        name = rng.choices(names, weights)[0]
+        plan.append(name)
+        if name == 'signal':
+            plan_users.append(base_id + n)
+    await asyncio.gather(*(bot.async_db.set_plan(chat_id, 'starter', expires, 2) for chat_id in plan_users))
+
+    async def one(n, name):
+        await asyncio.sleep(ramp * n / max(1, users))
+        user = VirtualUser(harness, base_id + n)
+        await SCRIPTS[name](user, random.Random(seed * 1_000_003 + n))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n, name) for n, name in enumerate(plan)))
+    elapsed = time.perf_counter() - started
+
+    result = harness.report()
+    result.update({
+        'users': users, 'scripts': {name: plan.count(name) for name in names}, 'seconds': elapsed,
+        'calls_per_sec': sum(h['calls'] for h in result['handlers'].values()) / elapsed if elapsed else 0.0,
+        # Розмір спільних структур bot після прогону — ріст без очищення вказує на витік
+        'shared_state': {'pending_signals': len(bot.pending_signals), 'searching_signals': len(bot.searching_signals),
+                         'pending_admin_user': len(bot.pending_admin_user),
+                         'scheduled': len(bot.delivery_scheduler)},
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--mix', default='buy=0.3,signal=0.4,status=0.3', help='сценарій=вага через кому')
+    parser.add_argument('--think', type=float, default=0.0, help='макс. пауза між кроками користувача, сек')
+    parser.add_argument('--ramp', type=float, default=1.0, help='за скільки секунд стартують усі користувачі')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='імітований час відповіді Bot API, сек')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help='не глушити INFO-логи бота')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    # Тимчасова БД — до імпорту bot, бо він викликає init_db() під час імпорту
+    tmpdir = tempfile.mkdtemp(prefix='load-bot-')
+    db.DB = os.path.join(tmpdir, 'bot_data.db')
+    db.USERS_JSON = os.path.join(tmpdir, 'users_data.json')
+    bot_logger = logging.getLogger('bot')
+    bot_logger.addHandler(_ErrorCollector(level=logging.ERROR))
+
+    import bot
+    import async_db
+    if not args.verbose:
+        bot.logger.setLevel(logging.WARNING)
+    try:
+        result = asyncio.run(run(args.users, _parse_mix(args.mix), args.think, args.ramp,
+                                 args.api_latency, args.seed))
+    finally:
+        async_db.shutdown()
+        db.flush_pending()
+        db.close_connections()
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    print(f"{result['users']} users {result['scripts']} in {result['seconds']:.2f}s "
+          f"({result['calls_per_sec']:.0f} handler calls/s)")
+    print(f"{'handler':<40} {'calls':>6} {'err%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label, h in result['handlers'].items():
+        print(f"{label:<40} {h['calls']:>6} {h['error_rate']:>6.1%} {h['p50_ms']:>8.2f} {h['p95_ms']:>8.2f} "
+              f"{h['p99_ms']:>8.2f} {h['max_ms']:>8.2f}")
+    print(f"sent: {result['sent']}")
+    print(f"shared state: {result['shared_state']}")
+    if result['missing_button']:
+        print(f"missing buttons: {result['missing_button']}")
+    for label, sample in result['error_samples'].items():
+        print(f"error in {label}: {sample}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Наскрізний бенчмарк генерації сигналів на записаному ринку (replay_exchange) замість Kraken.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.replay [--recording market.npz] [--requests 200] [--concurrency 16]
+                                [--latency 0.05] [--error-rate 0.01] [--speed 60] [--cold] [--mode sync]
+
+Без --recording свічки синтезуються (--save зберігає їх у .npz для повторних прогонів).
+sync  — N запитів generate_signal_message у пулі потоків (fetch → індикатори → стратегія → графік);
+async — шлях бота, як find_signal для одного символу (fetch_ohlcv_async + пул процесів + render_chart),
+        але помилки біржі не ковтаються, а рахуються у failed, як у sync.
+--cold очищає кеш свічок market_fetcher перед кожним запитом.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import market_fetcher
+import replay_exchange
+import signal_generator as sg
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'ADA/USDT', 'BNB/USDT',
+           'XRP/USDT', 'DOGE/USDT', 'AVAX/USDT', 'LTC/USDT', 'DOT/USDT']
+
+
+def percentile(samples, p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+
+def _requests(series, n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    pairs = sorted(series)
+    return [rng.choice(pairs) for _ in range(n)]
+
+
+def run_sync(requests, concurrency: int, cold: bool) -> tuple:
+    latencies, errors = [], []
+
+    def one(pair):
+        symbol, timeframe = pair
+        if cold:
+            market_fetcher.clear_cache()
+        started = time.perf_counter()
+        try:
+            sg.generate_signal_message(symbol, timeframe)
+        except Exception as e:
+            errors.append(type(e).__name__)
+            return
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, requests))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_async(requests, concurrency: int, cold: bool) -> tuple:
+    import workers
+    latencies, errors = [], []
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(pair):
+            symbol, timeframe = pair
+            async with semaphore:
+                if cold:
+                    market_fetcher.clear_cache()
+                started = time.perf_counter()
+                # find_signal ковтає помилки символу (None — і NEUTRAL, і збій біржі),
+                # тому тут той самий конвеєр напряму: NEUTRAL — успіх, виняток — failed
+                try:
+                    df = await market_fetcher.fetch_ohlcv_async(symbol, timeframe=timeframe, limit=300)
+                    signal = await workers.run_cpu(sg.generate_signal, symbol, timeframe, df)
+                    if signal.is_actionable:
+                        await sg.render_chart(signal, df)
+                except Exception as e:
+                    errors.append(type(e).__name__)
+                    return
+                latencies.append(time.perf_counter() - started)
+
+        # Прогрів пулу процесів (spawn + імпорти) не входить у вимір
+        await workers.run_cpu(sum, [0])
+        started = time.perf_counter()
+        await asyncio.gather(*(one(pair) for pair in requests))
+        return time.perf_counter() - started
+
+    try:
+        elapsed = asyncio.run(main())
+    finally:
+        workers.shutdown()
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recording', help='.npz із записаними свічками')
+    parser.add_argument('--save', help='зберегти синтезований запис у .npz')
+    parser.add_argument('--symbols', type=int, default=5, help='скільки символів синтезувати')
+    parser.add_argument('--rows', type=int, default=2000, help='свічок на пару при синтезі')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help='середня затримка біржі, сек')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='частка запитів з NetworkError')
+    parser.add_argument('--speed', type=float, default=60.0, help='симульованих секунд за реальну')
+    parser.add_argument('--cold', action='store_true', help='без кешу свічок між запитами')
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='вивести результат як JSON')
+    args = parser.parse_args()
+
+    if args.recording:
+        series = replay_exchange.load_recording(args.recording)
+    else:
+        series = replay_exchange.synthesize(SYMBOLS[:args.symbols], sg.TIMEFRAMES, rows=args.rows, seed=args.seed)
+        if args.save:
+            replay_exchange.save_recording(args.save, series)
+
+    options = dict(speed=args.speed, latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    sync_exchange = replay_exchange.ReplayExchange(series, **options)
+    async_exchange = replay_exchange.AsyncReplayExchange(series, clock=sync_exchange.clock, **options)
+    requests = _requests(series, args.requests, args.seed)
+    runner = run_sync if args.mode == 'sync' else run_async
+    with replay_exchange.installed(sync_exchange, async_exchange):
+        latencies, errors, elapsed = runner(requests, max(1, args.concurrency), args.cold)
+        cache = market_fetcher.get_cache_stats()
+
+    exchange_stats = (sync_exchange if args.mode == 'sync' else async_exchange).get_stats()
+    result = {
+        'mode': args.mode, 'requests': len(requests), 'ok': len(latencies),
+        'failed': len(requests) - len(latencies),
+        'seconds': elapsed, 'signals_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'exchange': exchange_stats, 'ohlcv_cache': cache,
+        'errors': {name: errors.count(name) for name in set(errors)},
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"mode={result['mode']} requests={result['requests']} ok={result['ok']} failed={result['failed']} "
+          f"in {result['seconds']:.2f}s")
+    print(f"signals/sec: {result['signals_per_sec']:.1f}")
+    print(f"latency ms: p50={result['p50_ms']:.1f} p95={result['p95_ms']:.1f} p99={result['p99_ms']:.1f}")
+    print(f"exchange: {exchange_stats} | cache: {cache}")
+    if result['errors']:
+        print(f"errors: {result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Офлайн-бенчмарки індикаторів, стратегій, графіка та db.py з JSON-звітом.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.suite [--sizes 300,10000,100000,1000000] [--output report.json]
+    python -m benchmarks.suite --compare base.json new.json [--threshold 0.10]
+
+Свічки синтетичні (benchmarks.chart.synthetic_ohlcv), БД — тимчасова, мережа не потрібна.
+У режимі --compare код виходу 1, якщо медіана хоч одного кейсу погіршилась більше ніж на threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import db
+import signal_generator as sg
+from benchmarks.chart import synthetic_ohlcv
+
+SIZES = (300, 10_000, 100_000, 1_000_000)
+
+# Кейси на свічках: назва -> fn(df); стратегії змінюють df (додають колонки), тому отримують копію
+OHLCV_CASES = {
+    'indicators.rsi': lambda df: sg.rsi(df['close']),
+    'indicators.atr': lambda df: sg.atr(df),
+    'indicators.macd': lambda df: sg.macd(df['close']),
+    'strategy.keltner_breakout': lambda df: sg.keltner_breakout(df),
+    'strategy.macd_strategy': lambda df: sg.macd_strategy(df),
+    'strategy.rsi_strategy': lambda df: sg.rsi_strategy(df),
+    'chart.generate_chart_image': lambda df: sg.generate_chart_image(df),
+}
+COPY_CASES = {'indicators.atr', 'strategy.keltner_breakout'}
+
+
+def measure(fn, budget: float, max_repeats: int = 1000, setup=None) -> dict:
+    """Повторює fn, доки не вичерпано budget секунд (мінімум 3 рази, для повільних — 1)"""
+    timings = []
+    spent = 0.0
+    while len(timings) < max_repeats:
+        arg = setup() if setup else None
+        started = time.perf_counter()
+        fn(arg) if setup else fn()
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+        if spent >= budget and (len(timings) >= 3 or elapsed >= budget):
+            break
+    timings.sort()
+    return {
+        'repeats': len(timings),
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': timings[0] * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'p95_ms': timings[max(0, int(len(timings) * 0.95) - 1)] * 1000,
+    }
+
+
+def bench_ohlcv(sizes, budget: float, only=None) -> dict:
+    results = {}
+    for rows in sizes:
+        df = synthetic_ohlcv(rows)
+        for name, fn in OHLCV_CASES.items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            if name in COPY_CASES:
+                result = measure(lambda frame: fn(frame), budget, setup=df.copy)
+            else:
+                result = measure(lambda: fn(df), budget)
+            results[f'{name}[{rows}]'] = dict(result, rows=rows)
+            print(f"{name + f'[{rows}]':<42} {result['median_ms']:>10.3f} ms  x{result['repeats']}", file=sys.stderr)
+    return results
+
+
+def bench_db(users: int, budget: float) -> dict:
+    """Основні операції db.py на тимчасовій БД з users користувачами"""
+    tmpdir = tempfile.mkdtemp(prefix='bench-suite-db-')
+    saved = db.DB, db.USERS_JSON
+    db.DB = os.path.join(tmpdir, 'bench.db')
+    db.USERS_JSON = os.path.join(tmpdir, 'users_data.json')  # без імпорту робочого JSON
+    db._user_cache.clear()
+    results = {}
+    try:
+        db.init_db()
+        expires = int(time.time()) + 86400
+        chat_ids = list(range(10_000, 10_000 + users))
+        for chat_id in chat_ids:
+            db.set_plan(chat_id, 'starter', expires, 1_000_000)
+            db.track_user(chat_id, f'user{chat_id}', 'Bench')
+        db.flush_pending()
+        counter = iter(range(10 ** 9))
+
+        def next_id():
+            return chat_ids[next(counter) % users]
+
+        def cold_get_user():
+            chat_id = next_id()
+            db._user_cache.pop(chat_id)
+            db.get_user(chat_id)
+
+        def payment():
+            code = f'bench-{next(counter)}'
+            db.create_payment(next_id(), 'starter', 10.0, 'USDT', code)
+            db.get_payment(code)
+
+        cases = {
+            'db.get_user': lambda: db.get_user(next_id()),
+            'db.get_user_uncached': cold_get_user,
+            'db.get_signals_available': lambda: db.get_signals_available(next_id()),
+            'db.decrement_signal': lambda: db.decrement_signal(next_id()),
+            'db.set_plan': lambda: db.set_plan(next_id(), 'starter', expires, 1_000_000),
+            'db.track_user': lambda: db.track_user(next_id(), 'bench', 'Bench'),
+            'db.find_tracked_user': lambda: db.find_tracked_user(f'user{next_id()}'),
+            'db.create_get_payment': payment,
+            'db.flush_pending': db.flush_pending,
+            'db.get_broadcast_recipients': lambda: db.get_broadcast_recipients(('starter',)),
+            'db.consume_signals[100]': lambda: db.consume_signals(chat_ids[:100]),
+        }
+        for name, fn in cases.items():
+            result = measure(fn, budget)
+            results[f'{name}[{users}u]'] = dict(result, users=users)
+            print(f"{name + f'[{users}u]':<42} {result['median_ms']:>10.3f} ms  x{result['repeats']}", file=sys.stderr)
+    finally:
+        db.flush_pending()
+        db.close_connections()
+        db._user_cache.clear()
+        db.DB, db.USERS_JSON = saved
+    return results
+
+
+def run(sizes=SIZES, budget: float = 0.5, db_users: int = 1000, only=None) -> dict:
+    results = {}
+    if not only or any(not prefix.startswith('db') for prefix in only):
+        results.update(bench_ohlcv(sizes, budget, only))
+    if not only or any(prefix.startswith('db') for prefix in only):
+        results.update(bench_db(db_users, budget))
+    return {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sizes': list(sizes),
+            'budget_s': budget,
+            'db_users': db_users,
+        },
+        'results': results,
+    }
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    """[(кейс, база мс, нове мс, зміна)] для кейсів з обох звітів; зміна > threshold — регресія"""
+    rows = []
+    for name, old in base['results'].items():
+        cur = new['results'].get(name)
+        if cur is None:
+            continue
+        change = cur['median_ms'] / old['median_ms'] - 1 if old['median_ms'] else 0.0
+        rows.append((name, old['median_ms'], cur['median_ms'], change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='кількість свічок через кому')
+    parser.add_argument('--budget', type=float, default=0.5, help='секунд на один кейс')
+    parser.add_argument('--db-users', type=int, default=1000)
+    parser.add_argument('--only', default='', help='префікси кейсів через кому (indicators,strategy,chart,db)')
+    parser.add_argument('--output', help='куди записати JSON-звіт (інакше — stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='порівняти два звіти')
+    parser.add_argument('--threshold', type=float, default=0.10, help='допустиме погіршення медіани (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            new = json.load(f)
+        rows = compare(base, new, args.threshold)
+        regressions = 0
+        print(f"{'case':<42} {'base ms':>10} {'new ms':>10} {'change':>8}")
+        for name, old_ms, new_ms, change in rows:
+            flag = ''
+            if change > args.threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"{name:<42} {old_ms:>10.3f} {new_ms:>10.3f} {change:>+8.1%}{flag}")
+        print(f"{regressions} regression(s) above {args.threshold:.0%} in {len(rows)} cases")
+        sys.exit(1 if regressions else 0)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    only = [p.strip() for p in args.only.split(',') if p.strip()]
+    report = run(sizes, args.budget, args.db_users, only)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"report: {args.output} ({len(report['results'])} cases)", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,24 @@
 import logging
 import string
 import random
-import json
-import os
 import asyncio
 from datetime import datetime, timedelta
 from io import BytesIO
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     ApplicationBuilder, ContextTypes, CommandHandler, CallbackQueryHandler,
     MessageHandler, filters
 )
-from config import TG_BOT_TOKEN, PRICES, CRYPTO_PAYMENTS, ADMIN_ID, MOD_CHANNEL_ID, USD_TO_UAH_RATE
-from db import (
-    init_db, get_user, decrement_signal, create_payment,
-    get_payment, update_payment, get_pending_payments, set_plan,
-    get_signals_available
+from config import (
+    TG_BOT_TOKEN, PRICES, CRYPTO_PAYMENTS, ADMIN_ID, MOD_CHANNEL_ID, USD_TO_UAH_RATE, SCANNER_ENABLED,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, LOOP_MONITOR_ENABLED
 )
-from payments import purchase_plan as payments_purchase_plan
+from db import init_db, close_connections, flush_pending
+import async_db
+import chart_cache
+import metrics
+from send_queue import SendQueue, PRIORITY_INTERACTIVE, PRIORITY_BULK
 import time
 
 # Логування
@@ -30,7 +31,8 @@ init_db()
 pending_signals = {}
 pending_admin_user = {}
 searching_signals = set()
-USERS_JSON = 'users_data.json'
+signal_scanner = None
+delivery_scheduler = None
 
 # Розширений список монет (BTC/ETH/SOL обов'язкові)
 SYMBOL_CANDIDATES = [
@@ -62,39 +64,6 @@ def is_admin(user_id):
 def generate_payment_code():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
 
-def load_users_json():
-    if os.path.exists(USERS_JSON):
-        try:
-            with open(USERS_JSON, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_users_json(users_data):
-    try:
-        with open(USERS_JSON, 'w', encoding='utf-8') as f:
-            json.dump(users_data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        logger.error(f"Error saving JSON: {e}")
-
-def track_user(user_id, username, first_name):
-    users = load_users_json()
-    if str(user_id) not in users:
-        users[str(user_id)] = {
-            'user_id': user_id,
-            'username': username or 'N/A',
-            'first_name': first_name or 'N/A',
-            'created_at': datetime.utcnow().isoformat(),
-            'last_seen': datetime.utcnow().isoformat(),
-            'plan': None,
-            'signals_daily': 0,
-            'signals_used_today': 0
-        }
-    else:
-        users[str(user_id)]['last_seen'] = datetime.utcnow().isoformat()
-    save_users_json(users)
-
 def plan_reliability_bounds(plan_key: str):
     if plan_key == 'starter':
         return (60, 80)
@@ -102,75 +71,100 @@ def plan_reliability_bounds(plan_key: str):
         return (80, 90)
     return (60, 80)
 
-async def send_signal_after_delay(chat_id: int, context: ContextTypes.DEFAULT_TYPE, min_delay=5*60, max_delay=60*60):
+async def pick_signal():
+    """Готовий Signal з пулу сканера, а якщо пул порожній — пошук наживо"""
+    if signal_scanner is not None:
+        found = await signal_scanner.take()
+        if found:
+            return found
+    from signal_generator import find_signal
+    symbols = SYMBOL_CANDIDATES.copy()
+    random.shuffle(symbols)
+    return await find_signal(symbols)
+
+async def send_signal_photo(bot, chat_id: int, signal, caption: str, priority=PRIORITY_INTERACTIVE):
+    """Надсилає графік сигналу. Якщо такий графік уже завантажувався — за file_id,
+    без повторного upload; після першого upload запам'ятовує file_id."""
+    file_id = chart_cache.get_file_id(signal.chart_key)
+    if file_id:
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption,
+                                        rate_limit_args=priority)
+        except BadRequest as e:
+            logger.warning(f"⚠️ Cached file_id rejected, re-uploading chart: {e}")
+            chart_cache.forget_file_id(signal.chart_key)
+    message = await bot.send_photo(chat_id=chat_id, photo=signal.chart_file(), caption=caption,
+                                   rate_limit_args=priority)
+    if message and message.photo:
+        chart_cache.remember_file_id(signal.chart_key, message.photo[-1].file_id)
+    return message
+
+async def deliver_signal(bot, chat_id: int):
+    """Доставка запланованого сигналу (викликається DeliveryScheduler, коли настав час)"""
     try:
-        delay = random.randint(min_delay, max_delay)
-        logger.info(f"⏳ Scheduled signal for {chat_id} in {delay} sec")
-        await asyncio.sleep(delay)
-
-        available, daily = get_signals_available(chat_id)
+        available, daily = await async_db.get_signals_available(chat_id)
         if available <= 0:
-            await context.bot.send_message(chat_id=chat_id, text="❌ Ваш денний ліміт сигналів сплив. Сигнал не надіслано.")
+            await bot.send_message(chat_id=chat_id, text="❌ Ваш денний ліміт сигналів сплив. Сигнал не надіслано.",
+                                   rate_limit_args=PRIORITY_BULK)
             searching_signals.discard(chat_id)
             return
 
-        symbols = SYMBOL_CANDIDATES.copy()
-        random.shuffle(symbols)
+        logger.info(f"🧪 Searching signal for user {chat_id}")
+        with metrics.DELIVERY_STAGES.time(stage='pick'):
+            found = await pick_signal()
 
-        success = False
-        errors = []
-        for sym in symbols:
-            try:
-                logger.info(f"🧪 Trying symbol {sym} for user {chat_id}")
-                from signal_generator import generate_signal_message
-                msg, chart = generate_signal_message(symbol=sym)
-
-                if "Signal: NEUTRAL" in msg:
-                    logger.info(f"⏭️ Signal {sym} is NEUTRAL, skipping...")
-                    continue
-
-                u = get_user(chat_id) or {}
-                plan = u.get('paid_plan', '')
-                low, high = plan_reliability_bounds(plan)
-                reliability = random.randint(low, high)
-                leverage = random.choice(range(25, 105, 5))
-
-                header = f"📡 Сигнал — {sym}\n"
-                meta = f"🔒 Надійність: {reliability}% | ⚖️ Плече: {leverage}x\n"
-                caption = header + meta + "\n" + msg
-
-                await context.bot.send_photo(chat_id=chat_id, photo=chart, caption=caption)
-
-                decrement_signal(chat_id)
-                users = load_users_json()
-                u_db = get_user(chat_id) or {}
-                if str(chat_id) in users:
-                    users[str(chat_id)]['signals_daily'] = u_db.get('signals_daily', 0)
-                    users[str(chat_id)]['signals_used_today'] = u_db.get('signals_used_today', 0)
-                    users[str(chat_id)]['plan'] = u_db.get('paid_plan')
-                    save_users_json(users)
-
-                success = True
-                logger.info(f"✅ Sent signal {sym} to {chat_id} (rel={reliability}%, lev={leverage}x)")
-                break
-            except Exception as e_sym:
-                etype = type(e_sym).__name__
-                logger.warning(f"⚠️ Symbol {sym} failed for {chat_id}: {etype} - {e_sym}")
-                errors.append(f"{sym}:{etype}")
-                continue
-
-        if not success:
-            await context.bot.send_message(chat_id=chat_id, text="⚠️ Нажаль, не змогли згенерувати сигнал. Спробуйте пізніше.")
-            logger.error(f"❌ All attempts failed for {chat_id}: {errors}")
+        if found:
+            sym = found.symbol
+            u = await async_db.get_user(chat_id) or {}
+            plan = u.get('paid_plan', '')
+            low, high = plan_reliability_bounds(plan)
+            reliability = random.randint(low, high)
+            leverage = random.choice(range(25, 105, 5))
+
+            header = f"📡 Сигнал — {sym}\n"
+            meta = f"🔒 Надійність: {reliability}% | ⚖️ Плече: {leverage}x\n"
+            caption = header + meta + "\n" + found.to_message()
+
+            with metrics.DELIVERY_STAGES.time(stage='send'):
+                await send_signal_photo(bot, chat_id, found, caption, priority=PRIORITY_BULK)
+
+            await async_db.decrement_signal(chat_id)
+
+            logger.info(f"✅ Sent signal {sym} to {chat_id} (rel={reliability}%, lev={leverage}x)")
+        else:
+            await bot.send_message(chat_id=chat_id, text="⚠️ Нажаль, не змогли згенерувати сигнал. Спробуйте пізніше.",
+                                   rate_limit_args=PRIORITY_BULK)
+            logger.error(f"❌ All attempts failed for {chat_id}")
         
         searching_signals.discard(chat_id)
     except Exception as e:
-        logger.error(f"❌ send_signal_after_delay error for {chat_id}: {type(e).__name__} - {e}")
+        logger.error(f"❌ deliver_signal error for {chat_id}: {type(e).__name__} - {e}")
         searching_signals.discard(chat_id)
 
+async def run_broadcast(bot, admin_id: int, tier: str, signal):
+    """Фонова розсилка одного сигналу всьому тарифу; підсумок — адміну"""
+    from broadcast import broadcast_signal
+    try:
+        low, high = plan_reliability_bounds(tier)
+        reliability = random.randint(low, high)
+        leverage = random.choice(range(25, 105, 5))
+        header = f"📡 Сигнал — {signal.symbol}\n"
+        meta = f"🔒 Надійність: {reliability}% | ⚖️ Плече: {leverage}x\n"
+        caption = header + meta + "\n" + signal.to_message()
+
+        stats = await broadcast_signal(bot, tier, signal, caption, send_signal_photo)
+        await bot.send_message(chat_id=admin_id, text=(
+            f"📣 Розсилка {signal.symbol} ({tier}) завершена\n"
+            f"👥 Отримувачів: {stats['recipients']}\n✅ Надіслано: {stats['sent']}\n"
+            f"❌ Помилок: {stats['failed']}\n⏱ {stats['seconds']} с"
+        ))
+    except Exception as e:
+        logger.error(f"❌ Broadcast error ({tier}): {type(e).__name__} - {e}")
+        await bot.send_message(chat_id=admin_id, text=f"❌ Помилка розсилки: {e}")
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    track_user(user.id, user.username, user.first_name)
+    await async_db.track_user(user.id, user.username, user.first_name)
     logger.info(f"✅ User started: {user.id}")
 
     kb = [
@@ -220,19 +214,40 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 [InlineKeyboardButton("🔎 Знайти користувача", callback_data="admin:find_user")],
                 [InlineKeyboardButton("💳 Перевірити платежі", callback_data="admin:check_payments")],
                 [InlineKeyboardButton("🎁 Дати собі тариф", callback_data="admin:self_plan")],
+                [InlineKeyboardButton("📣 Розсилка сигналу", callback_data="admin:broadcast")],
                 [InlineKeyboardButton("⬅️ Назад", callback_data="menu:main")]
             ]
             await query.edit_message_text("👨‍💼 Адмін Панель\n══════════════════════\nОберіть дію:", reply_markup=InlineKeyboardMarkup(kb))
             return
 
+        if data == 'admin:broadcast' and is_admin(chat_id):
+            kb = [
+                [InlineKeyboardButton("🔵 Усім Lite", callback_data="admin:broadcast:starter")],
+                [InlineKeyboardButton("🟢 Усім Pro", callback_data="admin:broadcast:pro")],
+                [InlineKeyboardButton("⬅️ Назад", callback_data="admin:menu")]
+            ]
+            await query.edit_message_text("📣 Один сигнал — усім користувачам тарифу, у кого лишився ліміт.\nОберіть тариф:", reply_markup=InlineKeyboardMarkup(kb))
+            return
+
+        if data.startswith('admin:broadcast:') and is_admin(chat_id):
+            tier = data.split(':', 2)[2]
+            await query.edit_message_text(f"⏳ Генерую сигнал для розсилки ({tier})...")
+            found = await pick_signal()
+            if not found:
+                await query.edit_message_text("⚠️ Не змогли згенерувати сигнал. Спробуйте пізніше.")
+                return
+            context.application.create_task(run_broadcast(context.bot, chat_id, tier, found))
+            await query.edit_message_text(f"📣 Розсилка {found.symbol} ({tier}) запущена. Підсумок прийде окремим повідомленням.")
+            return
+
         if data == 'admin:active_users' and is_admin(chat_id):
-            users = load_users_json()
+            users = await async_db.get_recent_users(20)
             if not users:
                 await query.edit_message_text("ℹ️ Немає активних користувачів")
                 return
             text = "👥 Останні активні користувачі (ID — username):\n\n"
-            for uid, udata in sorted(users.items(), key=lambda x: x[1].get('last_seen', ''), reverse=True)[:20]:
-                text += f"• {uid} — @{udata.get('username','N/A')}\n"
+            for udata in users:
+                text += f"• {udata['user_id']} — @{udata['username']}\n"
             kb = [[InlineKeyboardButton("⬅️ Назад", callback_data="admin:menu")]]
             await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(kb))
             return
@@ -243,7 +258,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         if data == 'admin:check_payments' and is_admin(chat_id):
-            payments = get_pending_payments()
+            payments = await async_db.get_pending_payments()
             if not payments:
                 kb = [[InlineKeyboardButton("⬅️ Назад", callback_data="admin:menu")]]
                 await query.edit_message_text("✅ Немає очікуючих платежів", reply_markup=InlineKeyboardMarkup(kb))
@@ -263,22 +278,15 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data.startswith('admin:approve:') and is_admin(chat_id):
             payment_code = data.split(':', 2)[2]
-            payment = get_payment(payment_code)
+            payment = await async_db.get_payment(payment_code)
             if not payment:
                 await query.edit_message_text("❌ Платіж не знайдено")
                 return
             try:
-                update_payment(payment_code, 'approved')
+                await async_db.update_payment(payment_code, 'approved')
                 plan = payment['plan']
                 user_id = payment['chat_id']
-                payments_purchase_plan(user_id, plan)
-                users = load_users_json()
-                u_db = get_user(user_id) or {}
-                if str(user_id) in users:
-                    users[str(user_id)]['plan'] = plan
-                    users[str(user_id)]['signals_daily'] = u_db.get('signals_daily', 0)
-                    users[str(user_id)]['signals_used_today'] = u_db.get('signals_used_today', 0)
-                    save_users_json(users)
+                await async_db.purchase_plan(user_id, plan)
                 await context.bot.send_message(chat_id=user_id, text=f"✅ Оплату підтверджено! План: {plan}")
                 await query.edit_message_text("✅ Платіж затверджено. Користувачу надіслано повідомлення.")
             except Exception as e:
@@ -288,12 +296,12 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data.startswith('admin:reject:') and is_admin(chat_id):
             payment_code = data.split(':', 2)[2]
-            payment = get_payment(payment_code)
+            payment = await async_db.get_payment(payment_code)
             if not payment:
                 await query.edit_message_text("❌ Платіж не знайдено")
                 return
             try:
-                update_payment(payment_code, 'rejected')
+                await async_db.update_payment(payment_code, 'rejected')
                 user_id = payment['chat_id']
                 await context.bot.send_message(chat_id=user_id, text=f"❌ Ваш платіж відхилено.\n\nКод: {payment_code}")
                 await query.edit_message_text("✅ Платіж відхилено. Користувачу надіслано повідомлення.")
@@ -314,14 +322,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if data.startswith('self:') and is_admin(chat_id):
             plan = data.split(':', 1)[1]
             try:
-                payments_purchase_plan(chat_id, plan)
-                users = load_users_json()
-                u_db = get_user(chat_id) or {}
-                if str(chat_id) in users:
-                    users[str(chat_id)]['plan'] = plan
-                    users[str(chat_id)]['signals_daily'] = u_db.get('signals_daily', 0)
-                    users[str(chat_id)]['signals_used_today'] = u_db.get('signals_used_today', 0)
-                    save_users_json(users)
+                await async_db.purchase_plan(chat_id, plan)
                 await query.edit_message_text(f"✅ Вам виданий тариф: {plan}")
             except Exception as e:
                 logger.error(f"Self plan error: {e}")
@@ -370,15 +371,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 expires = int((datetime.utcnow() + timedelta(days=days)).timestamp())
                 signals_daily = plan_config.get(plan, {}).get('signals_daily', 2)
                 
-                set_plan(target, plan, expires, signals_daily=signals_daily)
-                
-                users = load_users_json()
-                u_db = get_user(target) or {}
-                if str(target) in users:
-                    users[str(target)]['plan'] = plan
-                    users[str(target)]['signals_daily'] = signals_daily
-                    users[str(target)]['signals_used_today'] = 0
-                    save_users_json(users)
+                await async_db.set_plan(target, plan, expires, signals_daily=signals_daily)
                 
                 term_text = "1 місяць" if term == 'month' else "1 рік"
                 await query.edit_message_text(
@@ -400,13 +393,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if data.startswith('admin:revoke_plan:') and is_admin(chat_id):
             target = int(data.split(':', 2)[2])
             try:
-                set_plan(target, None, None, signals_daily=0)
-                users = load_users_json()
-                if str(target) in users:
-                    users[str(target)]['plan'] = None
-                    users[str(target)]['signals_daily'] = 0
-                    users[str(target)]['signals_used_today'] = 0
-                    save_users_json(users)
+                await async_db.set_plan(target, None, None, signals_daily=0)
                 await query.edit_message_text(f"✅ Тариф забрано у {target}")
             except Exception as e:
                 logger.error(f"Revoke error: {e}")
@@ -415,33 +402,23 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data.startswith('admin:add_signal:') and is_admin(chat_id):
             target = int(data.split(':', 2)[2])
-            u = get_user(target) or {}
+            u = await async_db.get_user(target) or {}
             daily = (u.get('signals_daily') or 0) + 1
-            set_plan(target, u.get('paid_plan'), u.get('plan_expires'), signals_daily=daily)
-            users = load_users_json()
-            if str(target) in users:
-                users[str(target)]['signals_daily'] = daily
-                users[str(target)]['signals_used_today'] = u.get('signals_used_today', 0)
-                save_users_json(users)
+            await async_db.set_plan(target, u.get('paid_plan'), u.get('plan_expires'), signals_daily=daily)
             await query.edit_message_text(f"✅ Додано 1 сигнал/день. Наразі: {daily}")
             return
 
         if data.startswith('admin:remove_signal:') and is_admin(chat_id):
             target = int(data.split(':', 2)[2])
-            u = get_user(target) or {}
+            u = await async_db.get_user(target) or {}
             daily = max(0, (u.get('signals_daily') or 0) - 1)
-            set_plan(target, u.get('paid_plan'), u.get('plan_expires'), signals_daily=daily)
-            users = load_users_json()
-            if str(target) in users:
-                users[str(target)]['signals_daily'] = daily
-                users[str(target)]['signals_used_today'] = u.get('signals_used_today', 0)
-                save_users_json(users)
+            await async_db.set_plan(target, u.get('paid_plan'), u.get('plan_expires'), signals_daily=daily)
             await query.edit_message_text(f"✅ Віднято 1 сигнал/день. Наразі: {daily}")
             return
 
         if data.startswith('admin:info:') and is_admin(chat_id):
             target = int(data.split(':', 2)[2])
-            u = get_user(target)
+            u = await async_db.get_user(target)
             if not u:
                 await query.edit_message_text("❌ Користувач не знайдений в БД")
                 return
@@ -535,7 +512,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 wallet = CRYPTO_PAYMENTS[crypto]['address']
 
                 try:
-                    create_payment(chat_id, plan, amount, crypto, payment_code)
+                    await async_db.create_payment(chat_id, plan, amount, crypto, payment_code)
                 except Exception as e:
                     logger.error(f"Payment creation error: {e}")
                     await query.edit_message_text("❌ Помилка створення платежу.", reply_markup=build_main_kb(chat_id))
@@ -565,7 +542,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 amount_uah = round(amount * USD_TO_UAH_RATE, 2)
 
                 try:
-                    create_payment(chat_id, plan, amount, crypto, payment_code)
+                    await async_db.create_payment(chat_id, plan, amount, crypto, payment_code)
                 except Exception as e:
                     logger.error(f"Payment creation error: {e}")
                     await query.edit_message_text("❌ Помилка створення платежу.", reply_markup=build_main_kb(chat_id))
@@ -594,7 +571,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 wallet = crypto_info['address']
                 
                 try:
-                    create_payment(chat_id, plan, amount, crypto, payment_code)
+                    await async_db.create_payment(chat_id, plan, amount, crypto, payment_code)
                 except Exception as e:
                     logger.error(f"Payment creation error: {e}")
                     await query.edit_message_text("❌ Помилка створення платежу.", reply_markup=build_main_kb(chat_id))
@@ -629,7 +606,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data.startswith('payment:confirm:'):
             payment_code = data.split(':', 2)[2]
-            payment = get_payment(payment_code)
+            payment = await async_db.get_payment(payment_code)
             if not payment:
                 await query.edit_message_text("❌ Платіж не знайдено.")
                 return
@@ -637,7 +614,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await query.edit_message_text(f"⚠️ Статус: {payment['status']}")
                 return
             try:
-                update_payment(payment_code, 'pending_screenshot')
+                await async_db.update_payment(payment_code, 'pending_screenshot')
             except Exception as e:
                 logger.error(f"Update error: {e}")
             await query.edit_message_text("📸 Надішліть скріншот транзакції (фото: сума, адреса, статус)")
@@ -647,7 +624,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data == 'menu:signal':
             logger.info(f"📡 User {chat_id} clicked get signal")
-            u = get_user(chat_id)
+            u = await async_db.get_user(chat_id)
             
             if chat_id in searching_signals:
                 await query.answer("⏳ Сигнал вже в процесі! Дочекайтесь першого сигналу перед активацією нового.", show_alert=True)
@@ -658,7 +635,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await context.bot.send_message(chat_id=chat_id, text="❌ У вас немає активного тарифу. Натисніть /start")
                 return
             
-            available, daily = get_signals_available(chat_id)
+            available, daily = await async_db.get_signals_available(chat_id)
             if available <= 0:
                 now = datetime.utcnow()
                 next_reset = now.replace(hour=8, minute=0, second=0, microsecond=0)
@@ -677,7 +654,7 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             searching_signals.add(chat_id)
             try:
-                context.application.create_task(send_signal_after_delay(chat_id, context, min_delay, max_delay))
+                await delivery_scheduler.schedule(chat_id, random.randint(min_delay, max_delay))
             except Exception as e_task:
                 logger.error(f"Failed to schedule task: {e_task}")
                 searching_signals.discard(chat_id)
@@ -699,45 +676,27 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             
             try:
-                from signal_generator import generate_signal_message
-                symbols = SYMBOL_CANDIDATES.copy()
-                random.shuffle(symbols)
-
-                success = False
-                errors = []
-                for sym in symbols:
-                    try:
-                        logger.info(f"🚀 Admin instant signal: trying {sym}")
-                        msg, chart = generate_signal_message(symbol=sym)
-
-                        if "Signal: NEUTRAL" in msg:
-                            logger.info(f"⏭️ Signal {sym} is NEUTRAL, skipping...")
-                            continue
-
-                        u = get_user(chat_id) or {}
-                        plan = u.get('paid_plan', '')
-                        low, high = plan_reliability_bounds(plan)
-                        reliability = random.randint(low, high)
-                        leverage = random.choice(range(25, 105, 5))
-
-                        header = f"📡 Сигнал (моментально) — {sym}\n"
-                        meta = f"🔒 Надійність: {reliability}% | ⚖️ Плече: {leverage}x\n"
-                        caption = header + meta + "\n" + msg
-
-                        await context.bot.send_photo(chat_id=chat_id, photo=chart, caption=caption)
-
-                        logger.info(f"✅ Instant signal sent to admin {chat_id}: {sym} (rel={reliability}%, lev={leverage}x)")
-                        success = True
-                        break
-                    except Exception as e_sym:
-                        etype = type(e_sym).__name__
-                        logger.warning(f"⚠️ Admin instant signal {sym} failed: {etype} - {e_sym}")
-                        errors.append(f"{sym}:{etype}")
-                        continue
-
-                if not success:
+                logger.info(f"🚀 Admin instant signal: searching")
+                found = await pick_signal()
+
+                if found:
+                    sym = found.symbol
+                    u = await async_db.get_user(chat_id) or {}
+                    plan = u.get('paid_plan', '')
+                    low, high = plan_reliability_bounds(plan)
+                    reliability = random.randint(low, high)
+                    leverage = random.choice(range(25, 105, 5))
+
+                    header = f"📡 Сигнал (моментально) — {sym}\n"
+                    meta = f"🔒 Надійність: {reliability}% | ⚖️ Плече: {leverage}x\n"
+                    caption = header + meta + "\n" + found.to_message()
+
+                    await send_signal_photo(context.bot, chat_id, found, caption)
+
+                    logger.info(f"✅ Instant signal sent to admin {chat_id}: {sym} (rel={reliability}%, lev={leverage}x)")
+                else:
                     await context.bot.send_message(chat_id=chat_id, text="⚠️ Не змогли згенерувати сигнал. Спробуйте ще раз.")
-                    logger.error(f"❌ All instant signal attempts failed for admin {chat_id}: {errors}")
+                    logger.error(f"❌ All instant signal attempts failed for admin {chat_id}")
 
                 searching_signals.discard(chat_id)
             except Exception as e:
@@ -748,14 +707,14 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data == 'menu:status':
             logger.info(f"📋 User {chat_id} opened status menu")
-            u = get_user(chat_id)
+            u = await async_db.get_user(chat_id)
             
             if not u or not u.get('paid_plan'):
                 kb = [[InlineKeyboardButton("🛒 Купити план", callback_data="menu:buy")],[InlineKeyboardButton("⬅️ Назад", callback_data="menu:main")]]
                 await query.edit_message_text("📋 Ваш Статус\n❌ Активний тариф: Немає", reply_markup=InlineKeyboardMarkup(kb))
                 return
             
-            available, daily = get_signals_available(chat_id)
+            available, daily = await async_db.get_signals_available(chat_id)
             now = datetime.utcnow()
             next_reset = now.replace(hour=8, minute=0, second=0, microsecond=0)
             if now >= next_reset:
@@ -810,7 +769,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if state == 'admin_grant_select_user' and is_admin(chat_id):
             try:
                 target_id = int(text)
-                u = get_user(target_id)
+                u = await async_db.get_user(target_id)
                 if not u:
                     await update.message.reply_text(f"❌ Користувач {target_id} не знайдений в БД")
                     return
@@ -830,15 +789,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if state == 'admin_find_user' and is_admin(chat_id):
             query_text = text
-            users = load_users_json()
-            found = None
-            if query_text.isdigit():
-                found = users.get(query_text)
-            else:
-                for uid, u in users.items():
-                    if u.get('username') and u.get('username').lower() == query_text.lstrip('@').lower():
-                        found = u
-                        break
+            found = await async_db.find_tracked_user(query_text)
             context.user_data['state'] = None
             if not found:
                 await update.message.reply_text("❌ Користувача не знайдено")
@@ -861,7 +812,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 photo = update.message.photo[-1]
                 photo_id = photo.file_id
 
-                payment = get_payment(payment_code)
+                payment = await async_db.get_payment(payment_code)
                 wallet_addr = None
                 if payment and payment.get('crypto'):
                     wallet_info = CRYPTO_PAYMENTS.get(payment['crypto'], {})
@@ -885,7 +836,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         valid = True
 
                 try:
-                    update_payment(payment_code, 'pending_screenshot', screenshot_url=photo_id)
+                    await async_db.update_payment(payment_code, 'pending_screenshot', screenshot_url=photo_id)
                 except Exception as e:
                     logger.error(f"❌ Update payment error: {e}")
 
@@ -928,8 +879,73 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"❌ MESSAGE ERROR: {type(e).__name__} - {e} | user={chat_id}")
 
+async def on_startup(app):
+    global signal_scanner, delivery_scheduler
+    from delivery_scheduler import DeliveryScheduler
+    delivery_scheduler = DeliveryScheduler(lambda chat_id: deliver_signal(app.bot, chat_id))
+    # Доставки, заплановані до перезапуску, знову «в пошуку»
+    searching_signals.update(await delivery_scheduler.recover())
+    app.bot_data['delivery_task'] = asyncio.create_task(delivery_scheduler.run())
+    if SCANNER_ENABLED:
+        from scanner import SignalScanner
+        signal_scanner = SignalScanner(SYMBOL_CANDIDATES)
+        app.bot_data['scanner_task'] = asyncio.create_task(signal_scanner.run())
+    if LOOP_MONITOR_ENABLED:
+        from loop_monitor import LoopMonitor
+        monitor = app.bot_data['loop_monitor'] = LoopMonitor()
+        monitor.start()
+        metrics.register_collector('loop_monitor', monitor.get_stats)
+    if METRICS_ENABLED:
+        register_metrics(app)
+        try:
+            app.bot_data['metrics_server'] = metrics.start_http_server(METRICS_PORT, METRICS_HOST)
+        except OSError as e:
+            logger.error(f"❌ Metrics server failed to start on {METRICS_HOST}:{METRICS_PORT}: {e}")
+
+def register_metrics(app):
+    """Gauge-метрики з get_stats модулів (знімаються під час кожного scrape)"""
+    import db
+    import workers
+    import market_fetcher
+    rate_limiter = app.bot.rate_limiter
+    if rate_limiter is not None:
+        metrics.register_collector('send_queue', rate_limiter.get_stats)
+    metrics.register_collector('delivery', delivery_scheduler.get_stats)
+    metrics.register_collector('workers', workers.get_stats)
+    metrics.register_collector('async_db', async_db.get_stats)
+    metrics.register_collector('user_cache', db.get_user_cache_stats)
+    metrics.register_collector('write_behind', db.get_write_behind_stats)
+    metrics.register_collector('chart_cache', chart_cache.get_stats)
+    metrics.register_collector('market_cache', market_fetcher.get_cache_stats)
+
+async def on_shutdown(app):
+    from market_fetcher import close_async_exchange
+    from gemini_client import close_async_client
+    import workers
+    for key in ('scanner_task', 'delivery_task'):
+        task = app.bot_data.pop(key, None)
+        if task:
+            task.cancel()
+    monitor = app.bot_data.pop('loop_monitor', None)
+    if monitor:
+        monitor.stop()
+    server = app.bot_data.pop('metrics_server', None)
+    if server:
+        server.shutdown()
+    await close_async_exchange()
+    await close_async_client()
+    workers.shutdown(wait=False)
+    # Спершу скинути відкладені записи (квоти, last_seen), потім зупиняти потік БД і закривати з'єднання;
+    # другий flush — записи від запитів, що ще лишались у черзі потоку БД
+    flush_pending()
+    async_db.shutdown()
+    flush_pending()
+    close_connections()
+
 def main():
-    app = ApplicationBuilder().token(TG_BOT_TOKEN).build()
+    # Усі запити до Telegram ідуть через SendQueue (ліміти, пріоритети, RetryAfter)
+    app = (ApplicationBuilder().token(TG_BOT_TOKEN).rate_limiter(SendQueue())
+           .post_init(on_startup).post_shutdown(on_shutdown).build())
     app.add_handler(CommandHandler('start', start))
     app.add_handler(CallbackQueryHandler(callback_router))
     app.add_handler(MessageHandler(filters.PHOTO | filters.Document.ALL, handle_message))
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+import async_db
+import chart_cache
+from config import BROADCAST_CONCURRENCY, BROADCAST_BATCH
+from send_queue import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+# Тарифні рівні для розсилки: рівень -> ключі планів (payments.plan_config)
+TIERS = {
+    'starter': ('starter', 'bot1_year'),
+    'pro': ('pro', 'bot2_year'),
+}
+
+
+async def broadcast_signal(bot, tier: str, signal, caption: str, send_photo,
+                           max_concurrency: int = BROADCAST_CONCURRENCY, batch_size: int = BROADCAST_BATCH) -> dict:
+    """Розсилає один готовий Signal (повідомлення + графік) усім користувачам рівня tier,
+    у яких лишились сигнали на сьогодні.
+
+    Графік завантажується в Telegram один раз — далі всі отримують той самий file_id.
+    send_photo(bot, chat_id, signal, caption, priority=...) — функція відправки графіка
+    з file_id-кешем (bot.send_signal_photo). Ліміт списується пачками по batch_size
+    однією транзакцією, одночасно виконується не більше max_concurrency відправок."""
+    if tier not in TIERS:
+        raise ValueError(f"Unknown tier: {tier}")
+    started = time.monotonic()
+    recipients = await async_db.get_broadcast_recipients(TIERS[tier])
+    stats = {'tier': tier, 'recipients': len(recipients), 'sent': 0, 'failed': 0, 'consumed': 0}
+    delivered = []
+
+    async def consume():
+        batch = delivered[:]
+        delivered.clear()
+        if batch:
+            consumed = await async_db.consume_signals(batch)
+            stats['consumed'] += consumed
+
+    async def send(chat_id):
+        try:
+            await send_photo(bot, chat_id, signal, caption, priority=PRIORITY_BULK)
+        except Exception as e:
+            stats['failed'] += 1
+            logger.warning(f"⚠️ Broadcast to {chat_id} failed: {type(e).__name__} - {e}")
+            return
+        stats['sent'] += 1
+        delivered.append(chat_id)
+        if len(delivered) >= batch_size:
+            await consume()
+
+    # Перший успішний upload дає file_id; до того відправляємо по одному
+    remaining = iter(recipients)
+    for chat_id in remaining:
+        await send(chat_id)
+        if chart_cache.get_file_id(signal.chart_key):
+            break
+
+    async def worker():
+        for chat_id in remaining:  # спільний ітератор — кожен chat_id дістається одному воркеру
+            await send(chat_id)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, max_concurrency))))
+    await consume()
+
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    logger.info(f"📣 Broadcast {signal.symbol} to {tier}: {stats['sent']}/{stats['recipients']} sent, "
+                f"{stats['failed']} failed in {stats['seconds']}s")
+    return stats
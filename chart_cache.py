@@ -0,0 +1,54 @@
+import logging
+from cache import LRUCache
+from config import CHART_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Версія оформлення графіка — змінюється разом зі стилем, щоб не віддати старі PNG
+CHART_STYLE = 'dark-v1'
+
+# (symbol, timeframe, ts останньої свічки, стиль) -> {'png': bytes, 'file_id': str | None}
+_charts = LRUCache(CHART_CACHE_SIZE)
+
+
+def chart_key(symbol: str, timeframe: str, df, style: str = CHART_STYLE) -> tuple:
+    last_ts = df['ts'].iloc[-1]
+    return symbol, timeframe, str(last_ts), style
+
+
+def get_png(key):
+    entry = _charts.get(key)
+    return entry['png'] if entry else None
+
+
+def put_png(key, png: bytes):
+    _charts.set(key, {'png': png, 'file_id': None})
+
+
+def get_file_id(key):
+    """Telegram file_id вже завантаженого графіка (повторне надсилання без upload)"""
+    if key is None:
+        return None
+    entry = _charts.get(key)
+    return entry['file_id'] if entry else None
+
+
+def remember_file_id(key, file_id: str):
+    if key is None:
+        return
+    entry = _charts.get(key)
+    if entry is not None:
+        entry['file_id'] = file_id
+    else:
+        # PNG вже витіснено з кешу, але file_id достатньо для повторних відправок
+        _charts.set(key, {'png': None, 'file_id': file_id})
+
+
+def forget_file_id(key):
+    entry = _charts.get(key)
+    if entry is not None:
+        entry['file_id'] = None
+
+
+def get_stats() -> dict:
+    return _charts.get_stats()
@@ -0,0 +1,100 @@
+import math
+import threading
+import numpy as np
+import matplotlib.dates as mdates
+from io import BytesIO
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+LINE_COLOR = '#00BCD4'
+FIG_FACE = '#1a1a1a'
+AX_FACE = '#0d0d0d'
+TEXT_COLOR = '#ffffff'
+MARGIN = 0.05  # як стандартні відступи autoscale у matplotlib
+
+
+class ChartRenderer:
+    """Шаблон графіка: фігура й оформлення створюються один раз, для кожного
+    графіка оновлюються лише дані лінії та заливки. Рендер — напряму через Agg
+    у перевикористовуваний буфер, без pyplot і savefig."""
+
+    def __init__(self):
+        self.fig = Figure(figsize=(10, 5), dpi=100, facecolor=FIG_FACE)
+        self.canvas = FigureCanvasAgg(self.fig)
+        ax = self.ax = self.fig.add_subplot()
+
+        self.line, = ax.plot([], [], linewidth=2.5, color=LINE_COLOR, label='Ціна')
+        self.band = ax.fill_between([0, 1], [0, 0], [1, 1], alpha=0.1, color=LINE_COLOR)
+        ax.set_ylabel('Ціна (USDT)', fontsize=11, fontweight='bold')
+        ax.set_xlabel('Час', fontsize=11, fontweight='bold')
+        ax.set_title('Аналіз ринку в реальному часі', fontsize=13, fontweight='bold')
+        ax.grid(True, alpha=0.2, linestyle='--')
+        ax.legend(fontsize=10)
+
+        ax.set_facecolor(AX_FACE)
+        ax.tick_params(colors=TEXT_COLOR)
+        ax.xaxis.label.set_color(TEXT_COLOR)
+        ax.yaxis.label.set_color(TEXT_COLOR)
+        ax.title.set_color(TEXT_COLOR)
+
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.AutoDateFormatter(locator))
+
+        self._buf = BytesIO()
+        self._layout_key = None
+        self._lock = threading.Lock()
+
+    def _relayout(self, low: float, high: float):
+        # tight_layout дорогий (повний draw) — перераховуємо лише коли змінюється
+        # порядок цін, тобто ширина підписів осі Y
+        key = (int(math.log10(max(abs(high), 1e-12))), int(math.log10(max(abs(high - low), 1e-12))))
+        if key != self._layout_key:
+            self.fig.tight_layout()
+            self._layout_key = key
+
+    def render(self, ts, close, low, high) -> bytes:
+        x = mdates.date2num(ts)
+        close = np.asarray(close, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+
+        with self._lock:
+            self.line.set_data(x, close)
+            # Полігон заливки: high зліва направо, low — назад
+            verts = np.column_stack((np.concatenate((x, x[::-1])), np.concatenate((high, low[::-1]))))
+            self.band.set_verts([verts])
+
+            x0, x1 = x.min(), x.max()
+            y0 = float(np.nanmin(np.minimum(low, close)))
+            y1 = float(np.nanmax(np.maximum(high, close)))
+            dx = (x1 - x0) * MARGIN or 1.0
+            dy = (y1 - y0) * MARGIN or max(abs(y1) * MARGIN, 1.0)
+            self.ax.set_xlim(x0 - dx, x1 + dx)
+            self.ax.set_ylim(y0 - dy, y1 + dy)
+            self._relayout(y0, y1)
+
+            self._buf.seek(0)
+            self._buf.truncate()
+            self.canvas.print_png(self._buf)
+            return self._buf.getvalue()
+
+
+# Один шаблон на процес (кожен воркер пулу створює свій при першому графіку)
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> ChartRenderer:
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = ChartRenderer()
+    return _renderer
+
+
+def render_png(df) -> bytes:
+    """PNG графіка ціни для df зі стовпцями ts/close/low/high"""
+    return get_renderer().render(df['ts'].to_numpy(), df['close'].to_numpy(),
+                                 df['low'].to_numpy(), df['high'].to_numpy())
@@ -24,6 +24,69 @@ PRICES = {
 
 USD_TO_UAH_RATE = 40.0  
 
+# Скільки символів одночасно завантажувати з біржі під час пошуку сигналу
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '5'))
+
+# Пули виконавців: процеси для індикаторів/графіків, потоки для I/O
+CPU_WORKERS = int(os.getenv('CPU_WORKERS', '2'))
+IO_WORKERS = int(os.getenv('IO_WORKERS', '8'))
+WORKER_QUEUE_DEPTH = int(os.getenv('WORKER_QUEUE_DEPTH', '100'))
+
+# Фоновий сканер ринку: готує пул сигналів після закриття кожної свічки
+SCANNER_ENABLED = os.getenv('SCANNER_ENABLED', '1') == '1'
+SCANNER_DELAY = int(os.getenv('SCANNER_DELAY', '15'))  # сек після закриття свічки
+
+# Скільки відрендерених графіків (PNG + Telegram file_id) тримати в пам'яті
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '128'))
+
+# Відкладений запис last_seen і лічильників сигналів: скидання в БД пачкою
+WRITE_BEHIND_INTERVAL = float(os.getenv('WRITE_BEHIND_INTERVAL', '5'))  # сек
+WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', '500'))
+
+# Кеш рядків користувачів (get_user) у пам'яті
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '30'))  # сек
+
+# Відкладена доставка сигналів: скільки доставок виконується одночасно
+DELIVERY_WORKERS = int(os.getenv('DELIVERY_WORKERS', '8'))
+
+# Вихідна черга Telegram: ліміти повідомлень (загальний і на чат), повідомлень/сек
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '30'))
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', '1'))
+SEND_GROUP_RATE = float(os.getenv('SEND_GROUP_RATE', str(20 / 60)))  # групи й канали
+SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', '3'))
+SEND_MAX_INFLIGHT = int(os.getenv('SEND_MAX_INFLIGHT', '32'))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))
+
+# Розсилка одного сигналу всім користувачам тарифу
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '20'))
+BROADCAST_BATCH = int(os.getenv('BROADCAST_BATCH', '500'))  # списання ліміту пачками
+
+# Gemini: адреса API (можна підмінити локальним сервером), дедлайн запиту з усіма повторами,
+# розмір пулу з'єднань, кеш відповідей і circuit breaker
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-pro')
+GEMINI_DEADLINE = float(os.getenv('GEMINI_DEADLINE', '20'))  # сек
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '3'))
+GEMINI_POOL_SIZE = int(os.getenv('GEMINI_POOL_SIZE', '10'))
+GEMINI_CACHE_SIZE = int(os.getenv('GEMINI_CACHE_SIZE', '256'))
+GEMINI_CACHE_TTL = float(os.getenv('GEMINI_CACHE_TTL', '300'))  # сек, якщо таймфрейм не вказано
+GEMINI_BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', '5'))
+GEMINI_BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', '60'))  # сек
+
+# Локальний endpoint метрик (Prometheus text format): http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Watchdog event loop: зупинка довша за поріг пишеться в метрики і звіт зі стеком
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.25'))  # сек
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.1'))  # сек між heartbeat
+LOOP_REPORT_PATH = os.getenv('LOOP_REPORT_PATH', 'loop_lag.log')
+LOOP_REPORT_MAX_BYTES = int(os.getenv('LOOP_REPORT_MAX_BYTES', str(5 * 1024 * 1024)))
+LOOP_REPORT_BACKUPS = int(os.getenv('LOOP_REPORT_BACKUPS', '3'))
+
 # Crypto payment config
 CRYPTO_PAYMENTS = {
     'usdt': {
@@ -1,18 +1,155 @@
+import json
 import sqlite3
-from contextlib import closing
+from contextlib import contextmanager
 import logging
+import threading
 import time
 import os
+from datetime import datetime, timezone
+from cache import LRUCache
+from config import WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_PENDING, USER_CACHE_SIZE, USER_CACHE_TTL
+from write_behind import WriteBehindBuffer, add
 
 logger = logging.getLogger(__name__)
 
 DB = 'bot_data.db'
+DAILY_RESET_HOUR = 8  # UTC; денний ліміт сигналів скидається ліниво, при читанні користувача
+USERS_JSON = 'users_data.json'  # старий реєстр користувачів, імпортується один раз
+
+# Налаштування з'єднань: WAL дозволяє читати паралельно із записом,
+# busy_timeout — чекати на блокування замість миттєвого "database is locked"
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 8192
+STATEMENT_CACHE = 256
+
+_local = threading.local()
+_all_connections = []
+_connections_lock = threading.Lock()
+_generation = 0  # збільшується в close_connections — потоки перевідкривають з'єднання
+
+
+def _open_connection(path):
+    # Кожне з'єднання використовує лише потік-власник, але закривати їх треба
+    # з іншого потоку (close_connections при зупинці) — тому check_same_thread=False
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE,
+                           check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+def get_connection():
+    """Довгоживуче з'єднання поточного потоку (одне на потік і файл БД).
+    Підготовлені запити кешуються sqlite3 в межах з'єднання."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB or _local.generation != _generation:
+        if conn is not None:
+            _close(conn)  # інший файл БД — старе з'єднання потоку більше не потрібне
+        conn = _open_connection(DB)
+        _local.conn, _local.path, _local.generation = conn, DB, _generation
+        with _connections_lock:
+            _all_connections.append(conn)
+    return conn
+
+
+def _close(conn):
+    with _connections_lock:
+        if conn in _all_connections:
+            _all_connections.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Failed to close DB connection: {type(e).__name__} - {e}")
+
+
+@contextmanager
+def _connection():
+    conn = get_connection()
+    try:
+        yield conn
+    except Exception:
+        # Не лишаємо напіввиконану транзакцію на спільному з'єднанні
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def close_connection():
+    """Закриває з'єднання поточного потоку (потік завершує роботу); з'єднань інших потоків не чіпає"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        _close(conn)
+
+
+def close_connections():
+    """Закриває всі відкриті з'єднання (при зупинці бота)"""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        connections = _all_connections[:]
+        _all_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Failed to close DB connection: {type(e).__name__} - {e}")
+
+
+def _flush_activity(items):
+    """items: [(user_id, (username, first_name, last_seen))]"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.executemany('''INSERT INTO tracked_users (user_id, username, first_name, created_at, last_seen)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username=excluded.username, first_name=excluded.first_name, last_seen=excluded.last_seen''',
+            [(user_id, username, first_name, seen, seen) for user_id, (username, first_name, seen) in items])
+        conn.commit()
+
+
+def _flush_usage(items):
+    """items: [(chat_id, скільки сигналів додати до signals_used_today)]"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.executemany('UPDATE users SET signals_used_today=COALESCE(signals_used_today, 0)+? WHERE chat_id=?',
+                      [(delta, chat_id) for chat_id, delta in items])
+        conn.commit()
+
+
+# Часті дрібні записи (last_seen, лічильник використаних сигналів) накопичуються
+# в пам'яті й скидаються пачкою; читання накладають ще не записані значення
+_activity = WriteBehindBuffer('activity', _flush_activity, WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_PENDING)
+_usage = WriteBehindBuffer('signals_used', _flush_usage, WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_PENDING, merge=add)
+
+
+# Кеш рядків users (з уже накладеними відкладеними дельтами). Записи оновлюють
+# або скидають свій ключ під _users_lock, тож кеш не відстає від БД
+_user_cache = LRUCache(USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_users_lock = threading.RLock()
+
+
+def flush_pending():
+    """Скидає відкладені записи в БД і зупиняє їхні потоки (при зупинці бота)"""
+    _activity.stop()
+    _usage.stop()
+
+
+def get_write_behind_stats() -> dict:
+    return {'activity': _activity.get_stats(), 'signals_used': _usage.get_stats()}
+
+
+def get_user_cache_stats() -> dict:
+    return _user_cache.get_stats()
 
 
 def init_db():
     """Ініціалізує базу даних з таблицями користувачів і платежів."""
     try:
-        with closing(sqlite3.connect(DB)) as conn:
+        with _connection() as conn:
             c = conn.cursor()
             
             # Перевірити чи існує стара таблиця з сигналами
@@ -65,6 +202,27 @@ def init_db():
                 screenshot_url TEXT,
                 location TEXT
             )''')
+
+            # Реєстр усіх, хто запускав бота (раніше — users_data.json)
+            c.execute('''CREATE TABLE IF NOT EXISTS tracked_users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                created_at INTEGER,
+                last_seen INTEGER
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_tracked_users_username ON tracked_users(username COLLATE NOCASE)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_tracked_users_last_seen ON tracked_users(last_seen)')
+            _import_users_json(c)
+
+            c.execute('CREATE INDEX IF NOT EXISTS idx_users_paid_plan ON users(paid_plan)')
+
+            # Відкладені доставки сигналів (переживають перезапуск бота)
+            c.execute('''CREATE TABLE IF NOT EXISTS scheduled_deliveries (
+                chat_id INTEGER PRIMARY KEY,
+                due_at REAL,
+                created_at INTEGER
+            )''')
             conn.commit()
         logger.info("✅ Database initialized")
     except Exception as e:
@@ -72,16 +230,52 @@ def init_db():
         raise
 
 
+def _iso_to_ts(value):
+    try:
+        return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def _import_users_json(c):
+    """Одноразова міграція users_data.json у tracked_users (лише в порожню таблицю)"""
+    if not os.path.exists(USERS_JSON):
+        return
+    c.execute('SELECT 1 FROM tracked_users LIMIT 1')
+    if c.fetchone():
+        return
+    try:
+        with open(USERS_JSON, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+    except Exception as e:
+        logger.error(f"❌ Users JSON import error: {e}")
+        return
+    rows = []
+    for uid, u in users.items():
+        try:
+            user_id = int(u.get('user_id') or uid)
+        except (TypeError, ValueError):
+            continue
+        rows.append((user_id, u.get('username'), u.get('first_name'),
+                     _iso_to_ts(u.get('created_at')), _iso_to_ts(u.get('last_seen'))))
+    c.executemany('''INSERT OR IGNORE INTO tracked_users
+        (user_id, username, first_name, created_at, last_seen) VALUES (?, ?, ?, ?, ?)''', rows)
+    logger.info(f"✅ Imported {len(rows)} users from {USERS_JSON}")
+
+
 def set_plan(chat_id, plan, expires_ts=None, signals_daily=None):
     """Встановлює план та денну кількість сигналів"""
     try:
-        with closing(sqlite3.connect(DB)) as conn:
-            c = conn.cursor()
-            c.execute('''REPLACE INTO users 
-                (chat_id, paid_plan, plan_expires, signals_daily, signals_used_today, last_reset) 
-                VALUES (?, ?, ?, ?, ?, ?)''',
-                (chat_id, plan, expires_ts, signals_daily, 0, int(time.time())))
-            conn.commit()
+        with _users_lock:
+            _usage.discard(chat_id)  # REPLACE обнуляє signals_used_today
+            with _connection() as conn:
+                c = conn.cursor()
+                c.execute('''REPLACE INTO users 
+                    (chat_id, paid_plan, plan_expires, signals_daily, signals_used_today, last_reset) 
+                    VALUES (?, ?, ?, ?, ?, ?)''',
+                    (chat_id, plan, expires_ts, signals_daily, 0, int(time.time())))
+                conn.commit()
+            _user_cache.pop(chat_id)
         logger.info(f"✅ Plan set: user={chat_id}, plan={plan}, daily_signals={signals_daily}")
     except Exception as e:
         logger.error(f"❌ Purchase plan error: {e}")
@@ -91,19 +285,17 @@ def set_plan(chat_id, plan, expires_ts=None, signals_daily=None):
 def decrement_signal(chat_id, amount: int = 1):
     """Віднімає сигнали витрачені сьогодні"""
     try:
-        with closing(sqlite3.connect(DB)) as conn:
-            c = conn.cursor()
-            c.execute('''SELECT signals_daily, signals_used_today FROM users WHERE chat_id=?''', (chat_id,))
-            row = c.fetchone()
-            if not row:
+        with _users_lock:
+            u = get_user(chat_id)
+            if not u:
                 raise ValueError("User not found")
-            
-            daily = row[0] or 0
-            used = (row[1] or 0) + amount
-            
-            c.execute('''UPDATE users SET signals_used_today=? WHERE chat_id=?''', (used, chat_id))
-            conn.commit()
-        
+
+            daily = u['signals_daily']
+            used = u['signals_used_today'] + amount
+            # Запис у БД — відкладений, пачкою (див. _usage); кеш оновлюється одразу
+            _usage.put(chat_id, amount)
+            _user_cache.set(chat_id, dict(u, signals_used_today=used))
+
         logger.info(f"✅ Signal used: user={chat_id}, used={used}/{daily}")
         return used
     except Exception as e:
@@ -111,25 +303,21 @@ def decrement_signal(chat_id, amount: int = 1):
         raise
 
 
-def reset_daily_signals():
-    """Скидає щодобові сигнали о 8:00 UTC"""
-    try:
-        current_time = int(time.time())
-        with closing(sqlite3.connect(DB)) as conn:
-            c = conn.cursor()
-            c.execute('''UPDATE users SET signals_used_today=0, last_reset=? WHERE signals_daily > 0''', 
-                (current_time,))
-            conn.commit()
-        logger.info(f"✅ Daily signals reset for all users")
-    except Exception as e:
-        logger.error(f"❌ Reset error: {e}")
-        raise
+def reset_boundary(now=None):
+    """Час останнього щоденного скидання сигналів (DAILY_RESET_HOUR UTC) на момент now"""
+    now = int(time.time()) if now is None else int(now)
+    return now - (now - DAILY_RESET_HOUR * 3600) % 86400
 
 
 def get_user(chat_id):
-    """Отримує дані користувача з бази даних за chat_id."""
+    """Отримує дані користувача за chat_id (з кешу або з бази даних)."""
+    boundary = reset_boundary()
+    cached = _user_cache.get(chat_id)
+    if cached is not None and cached['last_reset'] >= boundary:
+        return dict(cached)
     try:
-        with closing(sqlite3.connect(DB)) as conn:
+        # paused: відкладені дельти не можуть «переїхати» в БД між SELECT і _usage.get
+        with _users_lock, _usage.paused(), _connection() as conn:
             c = conn.cursor()
             c.execute('''SELECT chat_id, paid_plan, plan_expires, signals_daily, signals_used_today, last_reset 
                 FROM users WHERE chat_id=?''', (chat_id,))
@@ -137,19 +325,76 @@ def get_user(chat_id):
             if not row:
                 return None
             
-            return dict(
+            user = dict(
                 chat_id=row[0],
                 paid_plan=row[1],
                 plan_expires=row[2],
                 signals_daily=row[3] or 0,
-                signals_used_today=row[4] or 0,
+                signals_used_today=(row[4] or 0) + _usage.get(chat_id, 0),
                 last_reset=row[5] or 0
             )
+            if user['last_reset'] < boundary:
+                # Перше звернення після межі доби — скидаємо лише цього користувача.
+                # Відкладені дельти стосуються попередньої доби (кожен decrement іде через get_user)
+                _usage.discard(chat_id)
+                now = int(time.time())
+                c.execute('''UPDATE users SET signals_used_today=0, last_reset=? WHERE chat_id=?''', (now, chat_id))
+                conn.commit()
+                user.update(signals_used_today=0, last_reset=now)
+            _user_cache.set(chat_id, user)
+            return dict(user)
     except Exception as e:
         logger.error(f"❌ Get user error: {e}")
         return None
 
 
+def get_broadcast_recipients(plans, now=None):
+    """chat_id користувачів з активним тарифом із plans, у яких сьогодні лишились сигнали"""
+    try:
+        now = int(time.time()) if now is None else int(now)
+        _usage.flush()  # відкладені дельти мають бути в БД, щоб не обрати тих, хто вже вичерпав ліміт
+        plans = list(plans)
+        with _connection() as conn:
+            c = conn.cursor()
+            c.execute(f'''SELECT chat_id FROM users
+                WHERE paid_plan IN ({', '.join('?' * len(plans))})
+                AND (plan_expires IS NULL OR plan_expires > ?)
+                AND (COALESCE(last_reset, 0) < ? OR COALESCE(signals_used_today, 0) < signals_daily)''',
+                (*plans, now, reset_boundary(now)))
+            return [row[0] for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"❌ Broadcast recipients error: {e}")
+        return []
+
+
+def consume_signals(chat_ids):
+    """Списує по одному сигналу кожному з chat_ids однією транзакцією
+    (з тим самим лінивим скиданням доби, що й get_user)"""
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return 0
+    try:
+        now = int(time.time())
+        boundary = reset_boundary(now)
+        with _users_lock:
+            with _connection() as conn:
+                c = conn.cursor()
+                c.executemany('''UPDATE users SET
+                    signals_used_today = CASE WHEN COALESCE(last_reset, 0) < ? THEN 1
+                                              ELSE COALESCE(signals_used_today, 0) + 1 END,
+                    last_reset = CASE WHEN COALESCE(last_reset, 0) < ? THEN ? ELSE last_reset END
+                    WHERE chat_id=?''',
+                    [(boundary, boundary, now, chat_id) for chat_id in chat_ids])
+                conn.commit()
+            for chat_id in chat_ids:
+                _user_cache.pop(chat_id)
+        logger.info(f"✅ Signals consumed: {len(chat_ids)} users")
+        return len(chat_ids)
+    except Exception as e:
+        logger.error(f"❌ Consume signals error: {e}")
+        raise
+
+
 def get_signals_available(chat_id):
     """Перевіряє скільки сигналів доступно сьогодні"""
     u = get_user(chat_id)
@@ -164,7 +409,7 @@ def get_signals_available(chat_id):
 def create_payment(chat_id, plan, amount, crypto, payment_code):
     """Створює запис про платіж."""
     try:
-        with closing(sqlite3.connect(DB)) as conn:
+        with _connection() as conn:
             c = conn.cursor()
             c.execute('''INSERT INTO payments 
                 (chat_id, plan, amount, crypto, payment_code, status, created_at) 
@@ -181,7 +426,7 @@ def create_payment(chat_id, plan, amount, crypto, payment_code):
 def get_payment(payment_code):
     """Отримує дані платежу за кодом."""
     try:
-        with closing(sqlite3.connect(DB)) as conn:
+        with _connection() as conn:
             c = conn.cursor()
             c.execute('SELECT * FROM payments WHERE payment_code=?', (payment_code,))
             row = c.fetchone()
@@ -207,7 +452,7 @@ def get_payment(payment_code):
 def update_payment(payment_code, status, screenshot_url=None, location=None):
     """Оновлює статус платежу."""
     try:
-        with closing(sqlite3.connect(DB)) as conn:
+        with _connection() as conn:
             c = conn.cursor()
             c.execute('''UPDATE payments 
                 SET status=?, screenshot_url=?, location=? 
@@ -224,7 +469,7 @@ def update_payment(payment_code, status, screenshot_url=None, location=None):
 def get_pending_payments():
     """Отримує всі очікуючі платежі."""
     try:
-        with closing(sqlite3.connect(DB)) as conn:
+        with _connection() as conn:
             c = conn.cursor()
             c.execute('SELECT * FROM payments WHERE status=?', ('pending_screenshot',))
             rows = c.fetchall()
@@ -244,4 +489,93 @@ def get_pending_payments():
             ]
     except Exception as e:
         logger.error(f"❌ Get pending payments error: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def _tracked_user_row(row):
+    return {
+        'user_id': row[0],
+        'username': row[1] or 'N/A',
+        'first_name': row[2] or 'N/A',
+        'created_at': row[3],
+        'last_seen': row[4]
+    }
+
+
+def track_user(user_id, username, first_name):
+    """Реєструє користувача або оновлює last_seen та імена.
+    Запис відкладений: повторні візити між скиданнями зливаються в один upsert."""
+    _activity.put(user_id, (username, first_name, int(time.time())))
+
+
+def find_tracked_user(query):
+    """Шукає користувача за ID або username (без @, без урахування регістру)"""
+    try:
+        _activity.flush()  # щоб знайти і тих, хто ще в буфері
+        query = str(query).strip().lstrip('@')
+        with _connection() as conn:
+            c = conn.cursor()
+            if query.isdigit():
+                c.execute('''SELECT user_id, username, first_name, created_at, last_seen
+                    FROM tracked_users WHERE user_id=?''', (int(query),))
+            else:
+                c.execute('''SELECT user_id, username, first_name, created_at, last_seen
+                    FROM tracked_users WHERE username=? COLLATE NOCASE LIMIT 1''', (query,))
+            row = c.fetchone()
+            return _tracked_user_row(row) if row else None
+    except Exception as e:
+        logger.error(f"❌ Find user error: {e}")
+        return None
+
+
+def get_recent_users(limit=20):
+    """Останні активні користувачі (за last_seen)"""
+    try:
+        _activity.flush()
+        with _connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT user_id, username, first_name, created_at, last_seen
+                FROM tracked_users ORDER BY last_seen DESC LIMIT ?''', (limit,))
+            return [_tracked_user_row(row) for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"❌ Recent users error: {e}")
+        return []
+
+
+def add_scheduled_delivery(chat_id, due_at):
+    """Зберігає (або переносить) доставку сигналу користувачу на час due_at"""
+    try:
+        with _connection() as conn:
+            c = conn.cursor()
+            c.execute('''REPLACE INTO scheduled_deliveries (chat_id, due_at, created_at) VALUES (?, ?, ?)''',
+                (chat_id, due_at, int(time.time())))
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Schedule delivery error: {e}")
+        raise
+
+
+def remove_scheduled_deliveries(chat_ids):
+    """Видаляє виконані доставки однією транзакцією"""
+    try:
+        with _connection() as conn:
+            c = conn.cursor()
+            c.executemany('DELETE FROM scheduled_deliveries WHERE chat_id=?', [(chat_id,) for chat_id in chat_ids])
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Remove deliveries error: {e}")
+        return False
+
+
+def get_scheduled_deliveries():
+    """Усі відкладені доставки: [(chat_id, due_at)]"""
+    try:
+        with _connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT chat_id, due_at FROM scheduled_deliveries ORDER BY due_at')
+            return c.fetchall()
+    except Exception as e:
+        logger.error(f"❌ Get deliveries error: {e}")
+        return []
@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import logging
+import time
+import async_db
+import metrics
+from config import DELIVERY_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryScheduler:
+    """Єдиний планувальник відкладених доставок замість окремої корутини
+    з asyncio.sleep на кожного користувача.
+
+    Черга — мін-купа (due_at, chat_id) плюс словник chat_id -> due_at (на запис ~200 байт).
+    Кожен запис зберігається в scheduled_deliveries, тож після перезапуску
+    recover() відновлює чергу. Настали терміни — пачка chat_id іде в чергу
+    фіксованого набору воркерів, які викликають deliver_fn(chat_id)."""
+
+    def __init__(self, deliver_fn, max_workers: int = DELIVERY_WORKERS):
+        self.deliver_fn = deliver_fn
+        self.max_workers = max(1, max_workers)
+        self._heap = []
+        self._due = {}   # chat_id -> due_at; застарілі записи купи пропускаються
+        self._done = []  # доставлені, ще не видалені з БД
+        self._queue = None
+        self._wake = None
+        self._tasks = []
+        self.stats = {'scheduled': 0, 'recovered': 0, 'dispatched': 0, 'delivered': 0, 'failed': 0}
+
+    def __len__(self):
+        return len(self._due)
+
+    def is_pending(self, chat_id) -> bool:
+        return chat_id in self._due
+
+    def _push(self, chat_id, due_at):
+        self._due[chat_id] = due_at
+        heapq.heappush(self._heap, (due_at, chat_id))
+        if self._wake is not None and self._heap[0][1] == chat_id:
+            self._wake.set()  # новий найближчий термін
+
+    async def schedule(self, chat_id: int, delay: float):
+        """Запланувати доставку через delay секунд (повторний виклик переносить її)"""
+        due_at = time.time() + delay
+        previous = self._due.get(chat_id)
+        # Спершу в пам'ять: тоді _flush_done не видалить щойно збережений запис
+        self._push(chat_id, due_at)
+        try:
+            await async_db.add_scheduled_delivery(chat_id, due_at)
+        except BaseException:
+            # Запис у БД не вдався — відкочуємо і пам'ять, щоб не доставити те, про що користувач
+            # отримав «не вдалося запланувати» (якщо доставку ще не роздано воркерам)
+            if self._due.get(chat_id) == due_at:
+                if previous is None:
+                    del self._due[chat_id]  # запис купи стане застарілим і буде пропущений
+                else:
+                    self._push(chat_id, previous)
+            raise
+        metrics.DELIVERY_STAGES.observe(delay, stage='scheduled_delay')
+        self.stats['scheduled'] += 1
+        logger.info(f"⏳ Scheduled signal for {chat_id} in {int(delay)} sec")
+
+    async def recover(self) -> list:
+        """Завантажує збережені доставки з БД; повертає їхні chat_id"""
+        rows = await async_db.get_scheduled_deliveries()
+        for chat_id, due_at in rows:
+            self._push(chat_id, due_at)
+        self.stats['recovered'] += len(rows)
+        if rows:
+            logger.info(f"🔄 Recovered {len(rows)} scheduled deliveries")
+        return [chat_id for chat_id, _ in rows]
+
+    def _pop_due(self, now: float) -> list:
+        batch = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, chat_id = heapq.heappop(self._heap)
+            if self._due.get(chat_id) != due_at:
+                continue  # перенесена доставка — актуальний запис лежить далі в купі
+            del self._due[chat_id]
+            batch.append((chat_id, due_at))
+        return batch
+
+    async def _worker(self):
+        while True:
+            chat_id, due_at = await self._queue.get()
+            # Наскільки пізніше терміну воркер узявся за доставку
+            metrics.DELIVERY_STAGES.observe(max(0.0, time.time() - due_at), stage='queue_wait')
+            try:
+                await self.deliver_fn(chat_id)
+                self.stats['delivered'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"❌ Delivery error for {chat_id}: {type(e).__name__} - {e}")
+            finally:
+                self._done.append(chat_id)
+                self._wake.set()
+                self._queue.task_done()
+
+    async def _flush_done(self):
+        if not self._done:
+            return
+        done, self._done = self._done, []
+        # Якщо користувача встигли запланувати знову — його новий запис не чіпаємо
+        done = [chat_id for chat_id in done if chat_id not in self._due]
+        if done:
+            await async_db.remove_scheduled_deliveries(done)
+
+    async def run(self):
+        """Цикл диспетчера: спить до найближчого терміну, тоді роздає пачку воркерам"""
+        self._queue = asyncio.Queue(maxsize=self.max_workers * 2)
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        logger.info(f"📬 Delivery scheduler started: {len(self._due)} pending, {self.max_workers} workers")
+        try:
+            while True:
+                self._wake.clear()
+                await self._flush_done()
+                batch = self._pop_due(time.time())
+                for item in batch:
+                    await self._queue.put(item)  # чекає, якщо воркери зайняті
+                self.stats['dispatched'] += len(batch)
+                if batch:
+                    continue
+                timeout = self._heap[0][0] - time.time() if self._heap else None
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, pending=len(self._due), heap=len(self._heap),
+                    queued=self._queue.qsize() if self._queue else 0)
@@ -1,6 +1,16 @@
+import asyncio
+import hashlib
+import random
+import time
+import aiohttp
 import requests
 import logging
-from config import GEMINI_API_KEY
+from cache import LRUCache
+from config import (
+    GEMINI_API_KEY, GEMINI_BASE_URL, GEMINI_MODEL, GEMINI_DEADLINE, GEMINI_MAX_RETRIES,
+    GEMINI_POOL_SIZE, GEMINI_CACHE_SIZE, GEMINI_CACHE_TTL, GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_RESET
+)
+from market_fetcher import candle_close_ts
 
 logger = logging.getLogger(__name__)
 
@@ -27,4 +37,247 @@ class GeminiClient:
             return text if text else '❌ Немає відповіді від AI'
         except Exception as e:
             logger.error(f"Gemini client error: {e}")
-            return f'❌ Помилка AI: {str(e)}'
\ No newline at end of file
+            return f'❌ Помилка AI: {str(e)}'
+
+
+class GeminiError(RuntimeError):
+    """Помилка відповіді Gemini API (status — HTTP-код або None)"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpen(GeminiError):
+    """Circuit breaker розімкнено — запит не відправлявся"""
+
+
+class CircuitBreaker:
+    """Після threshold невдалих запитів поспіль розмикається на reset_timeout секунд;
+    потім пропускає один пробний запит (half-open)"""
+
+    def __init__(self, threshold: int = GEMINI_BREAKER_THRESHOLD, reset_timeout: float = GEMINI_BREAKER_RESET):
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Пробний запит завершився без вердикту (скасовано, 4xx) — наступний може пробувати знову"""
+        self._trial = False
+
+
+def prompt_key(prompt: str, model: str) -> str:
+    """Ключ кешу: sha256 нормалізованого промпту (пробіли схлопнуті)"""
+    normalized = ' '.join(prompt.split())
+    return hashlib.sha256(f'{model}\n{normalized}'.encode('utf-8')).hexdigest()
+
+
+def _extract_text(data: dict) -> str:
+    try:
+        text = data['candidates'][0]['content']['parts'][0].get('text', '')
+    except (KeyError, IndexError, TypeError, AttributeError):
+        raise GeminiError(f"Gemini returned malformed response: {str(data)[:200]}") from None
+    if not isinstance(text, str):
+        raise GeminiError(f"Gemini returned malformed response: {str(data)[:200]}")
+    return text
+
+
+def _retrieve_exception(task):
+    # Щоб asyncio не скаржився на непрочитаний виняток, коли очікувачів не лишилось
+    if not task.cancelled():
+        task.exception()
+
+
+class AsyncGeminiClient:
+    """Асинхронний клієнт Gemini: одна aiohttp-сесія з keep-alive пулом,
+    загальний дедлайн на запит разом із повторами (експоненційна затримка з jitter),
+    circuit breaker і кеш відповідей за хешем промпту до закриття поточної свічки.
+    Однакові промпти, що прийшли одночасно, виконуються одним запитом.
+
+    base_url можна підмінити локальним HTTP-сервером (тести, бенчмарки)."""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL, model=GEMINI_MODEL,
+                 deadline=GEMINI_DEADLINE, max_retries=GEMINI_MAX_RETRIES, pool_size=GEMINI_POOL_SIZE,
+                 cache_size=GEMINI_CACHE_SIZE, cache_ttl=GEMINI_CACHE_TTL, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.deadline = deadline
+        self.max_retries = max(0, max_retries)
+        self.pool_size = max(1, pool_size)
+        self.cache_ttl = cache_ttl
+        self.breaker = breaker or CircuitBreaker()
+        self._cache = LRUCache(cache_size, ttl=cache_ttl)
+        self._inflight = {}  # ключ промпту -> asyncio.Task
+        self._session = None
+        self.stats = {'requests': 0, 'api_calls': 0, 'retries': 0, 'failures': 0,
+                      'coalesced': 0, 'short_circuited': 0}
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/models/{self.model}:generateContent"
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, headers={'Content-Type': 'application/json'})
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _ttl(self, timeframe) -> float:
+        # Відповідь для ринкового промпту актуальна до закриття поточної свічки
+        if timeframe:
+            return max(1.0, candle_close_ts(timeframe) - time.time())
+        return self.cache_ttl
+
+    async def generate(self, prompt: str, timeframe: str = None) -> str:
+        """Текст відповіді; кидає GeminiError / CircuitOpen / asyncio.TimeoutError"""
+        self.stats['requests'] += 1
+        key = prompt_key(prompt, self.model)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._generate_shared(key, prompt, timeframe))
+            pending.add_done_callback(_retrieve_exception)
+            self._inflight[key] = pending
+        else:
+            self.stats['coalesced'] += 1
+        # shield — скасування одного очікувача (і того, хто почав запит) не скасовує спільний запит
+        return await asyncio.shield(pending)
+
+    async def _generate_shared(self, key: str, prompt: str, timeframe: str = None) -> str:
+        try:
+            text = await self._call(prompt)
+            self._cache.set(key, text, ttl=self._ttl(timeframe))
+            return text
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _call(self, prompt: str) -> str:
+        trial = self.breaker.state == 'half-open'
+        if not self.breaker.allow():
+            self.stats['short_circuited'] += 1
+            raise CircuitOpen(f"Gemini circuit open ({self.breaker.failures} failures)")
+        try:
+            return await self._request(prompt)
+        except (aiohttp.ClientError, asyncio.TimeoutError, GeminiError):
+            raise  # уже враховано в _request
+        except Exception:
+            self.stats['failures'] += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            if trial:
+                # Пробний запит без вердикту (скасування, 4xx) не має тримати half-open зайнятим назавжди
+                self.breaker.release()
+
+    async def _request(self, prompt: str) -> str:
+        payload = {'contents': [{'parts': [{'text': prompt}]}]}
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"Gemini deadline {self.deadline}s exceeded")
+                self.stats['api_calls'] += 1
+                timeout = aiohttp.ClientTimeout(total=remaining)
+                async with self._get_session().post(self.url, params={'key': self.api_key or ''},
+                                                    json=payload, timeout=timeout) as resp:
+                    if resp.status != 200:
+                        raise GeminiError(f"Gemini API error: {resp.status}", status=resp.status)
+                    data = await resp.json()
+                text = _extract_text(data)
+                if not text:
+                    raise GeminiError("Gemini returned empty response")
+                self.breaker.record_success()
+                return text
+            except (aiohttp.ClientError, asyncio.TimeoutError, GeminiError) as e:
+                retryable = not isinstance(e, GeminiError) or e.status in self.RETRY_STATUSES
+                # Повна jitter-затримка: рівномірно в [0, 0.5 * 2^attempt], але не довше дедлайну
+                backoff = random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+                if not retryable or attempt >= self.max_retries or time.monotonic() + backoff >= deadline:
+                    self.stats['failures'] += 1
+                    if retryable or getattr(e, 'status', None) is None:
+                        self.breaker.record_failure()
+                    # 4xx — сервіс відповідає, помилка в запиті: для breaker ні успіх, ні збій
+                    raise
+                attempt += 1
+                self.stats['retries'] += 1
+                logger.warning(f"⚠️ Gemini retry {attempt}/{self.max_retries} in {backoff:.2f}s: {type(e).__name__} - {e}")
+                await asyncio.sleep(backoff)
+
+    async def analyze_market(self, prompt: str, timeframe: str = None) -> str:
+        """Як GeminiClient.analyze_market, але без блокування event loop"""
+        try:
+            return await self.generate(prompt, timeframe)
+        except CircuitOpen:
+            return '❌ AI тимчасово недоступний'
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini deadline {self.deadline}s exceeded")
+            return '❌ AI не відповів вчасно'
+        except GeminiError as e:
+            logger.error(f"Gemini API error: {e}")
+            return '❌ Помилка аналізу AI'
+        except Exception as e:
+            logger.error(f"Gemini client error: {type(e).__name__} - {e}")
+            return f'❌ Помилка AI: {str(e)}'
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, breaker=self.breaker.state, cache=self._cache.get_stats())
+
+
+_async_client = None
+
+
+def get_async_client() -> AsyncGeminiClient:
+    """Спільний на процес асинхронний клієнт (одна сесія та пул з'єднань)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncGeminiClient()
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
@@ -0,0 +1,494 @@
+import numpy as np
+import pandas as pd
+from collections import deque
+from functools import cached_property
+
+
+def sma(values, period: int) -> np.ndarray:
+    """Просте ковзне середнє (як pandas rolling(period).mean()).
+    Початкові NaN пропускаються, перші period-1 значень — NaN."""
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    finite = np.flatnonzero(~np.isnan(x))
+    if not len(finite):
+        return out
+    first = finite[0]
+    x = x[first:]
+    if len(x) < period:
+        return out
+    # Зсув на перше значення зменшує похибку накопичення cumsum на довгих рядах
+    shifted = x - x[0]
+    csum = np.concatenate(([0.0], np.cumsum(shifted)))
+    out[first + period - 1:] = (csum[period:] - csum[:-period]) / period + x[0]
+    return out
+
+
+def _linear_scan(values: np.ndarray, beta: float, init: float = 0.0) -> np.ndarray:
+    """y[t] = beta * y[t-1] + x[t], y[-1] = init — без Python-циклу по свічках.
+    Ряд ріжеться на блоки: всередині блоку рекурсія рахується через cumsum,
+    між блоками переноситься один скаляр."""
+    n = len(values)
+    if n == 0 or beta == 0:
+        return values.copy()
+
+    # beta**-block не має перевищувати ~e^10, інакше втрачається точність
+    block = int(max(1, min(1024, 10.0 / -np.log(beta))))
+    blocks = -(-n // block)
+    padded = np.zeros(blocks * block)
+    padded[:n] = values
+    padded = padded.reshape(blocks, block)
+
+    j = np.arange(block)
+    local = np.cumsum(padded * beta ** -j, axis=1) * beta ** j
+    carry = np.empty(blocks)
+    acc, beta_block = float(init), beta ** block
+    for i, last in enumerate(local[:, -1]):
+        carry[i] = acc
+        acc = beta_block * acc + last
+    return (local + np.outer(carry, beta ** (j + 1))).ravel()[:n]
+
+
+def ewm_mean(values, span: int) -> np.ndarray:
+    """EMA як pandas ewm(span=span).mean() (adjust=True)"""
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    alpha = 2.0 / (span + 1.0)
+    beta = 1.0 - alpha
+    if n == 0 or beta == 0:
+        return x.copy()
+
+    numerator = _linear_scan(x, beta)
+    # Знаменник 1 + beta + ... + beta**t швидко сходиться до 1/alpha —
+    # степені рахуємо лише для початку ряду, поки beta**t помітне
+    denominator = np.full(n, 1.0 / alpha)
+    head = min(n, int(40.0 / -np.log(beta)) + 1)
+    denominator[:head] = (1.0 - beta ** (np.arange(head) + 1.0)) / alpha
+    return numerator / denominator
+
+
+def wilder_mean(values, period: int) -> np.ndarray:
+    """Згладжування Вайлдера: перше значення — SMA за period, далі
+    avg = (avg * (period - 1) + x) / period. Початкові NaN пропускаються."""
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    finite = np.flatnonzero(~np.isnan(x))
+    if not len(finite) or len(x) - finite[0] < period:
+        return out
+    start = finite[0] + period - 1
+    seed = x[finite[0]:start + 1].mean()
+    out[start] = seed
+    out[start + 1:] = _linear_scan(x[start + 1:] / period, (period - 1) / period, seed)
+    return out
+
+
+class IndicatorEngine:
+    """Індикатори на NumPy-масивах одного ряду свічок.
+    Проміжні значення (diff, gain/loss, TR, EMA, MA) рахуються один раз і кешуються."""
+
+    def __init__(self, close, high=None, low=None):
+        self.close = np.asarray(close, dtype=np.float64)
+        self.high = None if high is None else np.asarray(high, dtype=np.float64)
+        self.low = None if low is None else np.asarray(low, dtype=np.float64)
+        self._sma = {}
+        self._ema = {}
+        self._rsi = {}
+        self._rsi_wilder = {}
+        self._atr = {}
+        self._macd = {}
+        self._keltner = {}
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame) -> 'IndicatorEngine':
+        return cls(df['close'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy())
+
+    # --- спільні проміжні значення ---
+
+    @cached_property
+    def delta(self) -> np.ndarray:
+        delta = np.empty_like(self.close)
+        delta[:1] = np.nan
+        np.subtract(self.close[1:], self.close[:-1], out=delta[1:])
+        return delta
+
+    @cached_property
+    def gain(self) -> np.ndarray:
+        return np.nan_to_num(np.clip(self.delta, 0, None), nan=0.0)
+
+    @cached_property
+    def loss(self) -> np.ndarray:
+        return np.nan_to_num(-np.clip(self.delta, None, 0), nan=0.0)
+
+    @cached_property
+    def true_range(self) -> np.ndarray:
+        prev_close = np.empty_like(self.close)
+        prev_close[:1] = np.nan
+        prev_close[1:] = self.close[:-1]
+        return np.maximum(
+            self.high - self.low,
+            np.maximum(np.abs(self.high - prev_close), np.abs(self.low - prev_close))
+        )
+
+    # --- індикатори ---
+
+    def sma(self, period: int = 20) -> np.ndarray:
+        if period not in self._sma:
+            self._sma[period] = sma(self.close, period)
+        return self._sma[period]
+
+    def ema(self, span: int) -> np.ndarray:
+        if span not in self._ema:
+            self._ema[span] = ewm_mean(self.close, span)
+        return self._ema[span]
+
+    def rsi(self, period: int = 14) -> np.ndarray:
+        if period not in self._rsi:
+            avg_gain = sma(self.gain, period)
+            avg_loss = sma(self.loss, period)
+            rs = avg_gain / (avg_loss + 1e-9)
+            self._rsi[period] = 100 - (100 / (1 + rs))
+        return self._rsi[period]
+
+    def rsi_wilder(self, period: int = 14) -> np.ndarray:
+        """RSI зі згладжуванням Вайлдера (класичний варіант)"""
+        if period not in self._rsi_wilder:
+            gain = np.clip(self.delta, 0, None)
+            loss = -np.clip(self.delta, None, 0)
+            rs = wilder_mean(gain, period) / (wilder_mean(loss, period) + 1e-9)
+            self._rsi_wilder[period] = 100 - (100 / (1 + rs))
+        return self._rsi_wilder[period]
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        if period not in self._atr:
+            self._atr[period] = sma(self.true_range, period)
+        return self._atr[period]
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        """(macd_line, signal_line, histogram)"""
+        key = (fast, slow, signal)
+        if key not in self._macd:
+            macd_line = self.ema(fast) - self.ema(slow)
+            signal_line = ewm_mean(macd_line, signal)
+            self._macd[key] = (macd_line, signal_line, macd_line - signal_line)
+        return self._macd[key]
+
+    def keltner(self, period: int = 20, atr_mult: float = 2.0):
+        """(ma, atr, upper, lower). «ATR» тут — середній приріст high за вікно,
+        як у початковій стратегії: mean(diff(high[t-period+1..t]))."""
+        key = (period, atr_mult)
+        if key not in self._keltner:
+            ma = self.sma(period)
+            band = np.full(len(self.high), np.nan)
+            if period > 1 and len(self.high) >= period:
+                band[period - 1:] = (self.high[period - 1:] - self.high[:len(self.high) - period + 1]) / (period - 1)
+            elif period == 1:
+                band[:] = 0.0
+            self._keltner[key] = (ma, band, ma + band * atr_mult, ma - band * atr_mult)
+        return self._keltner[key]
+
+
+# --- Потокові індикатори: O(1) на свічку ---
+#
+# update(...) додає нову свічку, revise(...) переписує останню (ще не закриту).
+# seed(...) ініціалізує стан з історії. value — поточне значення (NaN, поки даних мало).
+
+class RollingMean:
+    """Ковзне середнє за period значень (як sma)"""
+
+    # Як часто перераховувати суму з нуля, щоб не накопичувати похибку
+    RESUM_EVERY = 1000
+
+    def __init__(self, period: int):
+        self.period = period
+        self._window = deque(maxlen=period)
+        self._sum = 0.0
+        self._updates = 0
+
+    def seed(self, values):
+        for x in values:
+            self.update(x)
+        return self
+
+    @property
+    def value(self) -> float:
+        if len(self._window) < self.period:
+            return float('nan')
+        return self._sum / self.period
+
+    def update(self, x: float) -> float:
+        if len(self._window) == self.period:
+            self._sum -= self._window[0]
+        self._window.append(x)
+        self._sum += x
+        self._updates += 1
+        if self._updates % self.RESUM_EVERY == 0:
+            self._sum = float(sum(self._window))
+        return self.value
+
+    def revise(self, x: float) -> float:
+        if not self._window:
+            return self.update(x)
+        self._sum += x - self._window[-1]
+        self._window[-1] = x
+        return self.value
+
+
+class EMA:
+    """EMA як ewm_mean / pandas ewm(span).mean() з adjust=True"""
+
+    def __init__(self, span: int):
+        self.beta = 1.0 - 2.0 / (span + 1.0)
+        self._num = self._den = 0.0
+        self._prev = (0.0, 0.0)
+
+    def seed(self, values):
+        for x in values:
+            self.update(x)
+        return self
+
+    @property
+    def value(self) -> float:
+        return self._num / self._den if self._den else float('nan')
+
+    def update(self, x: float) -> float:
+        self._prev = (self._num, self._den)
+        self._num = x + self.beta * self._num
+        self._den = 1.0 + self.beta * self._den
+        return self.value
+
+    def revise(self, x: float) -> float:
+        num, den = self._prev
+        self._num = x + self.beta * num
+        self._den = 1.0 + self.beta * den
+        return self.value
+
+
+class WilderMean:
+    """Згладжування Вайлдера (як wilder_mean)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self._seed = RollingMean(period)
+        self._avg = float('nan')
+        self._prev = float('nan')
+        self._count = 0
+
+    @property
+    def value(self) -> float:
+        return self._avg
+
+    def update(self, x: float) -> float:
+        self._count += 1
+        self._prev = self._avg
+        if self._count <= self.period:
+            self._avg = self._seed.update(x)
+        else:
+            self._avg = (self._avg * (self.period - 1) + x) / self.period
+        return self._avg
+
+    def revise(self, x: float) -> float:
+        if self._count <= self.period:
+            self._avg = self._seed.revise(x)
+        else:
+            self._avg = (self._prev * (self.period - 1) + x) / self.period
+        return self._avg
+
+
+class RSI:
+    """RSI по close. wilder=False — як IndicatorEngine.rsi (прості середні),
+    wilder=True — як IndicatorEngine.rsi_wilder."""
+
+    def __init__(self, period: int = 14, wilder: bool = False):
+        self.wilder = wilder
+        averager = WilderMean if wilder else RollingMean
+        self._gain = averager(period)
+        self._loss = averager(period)
+        self._last_close = None
+        self._prev_close = None
+
+    def seed(self, closes):
+        for x in closes:
+            self.update(x)
+        return self
+
+    @property
+    def value(self) -> float:
+        rs = self._gain.value / (self._loss.value + 1e-9)
+        return 100 - (100 / (1 + rs))
+
+    def _feed(self, method, close: float, prev_close):
+        if prev_close is None:
+            # Перша свічка: у пакетній версії diff = NaN -> 0 (прості середні)
+            # або пропускається (Вайлдер)
+            if not self.wilder:
+                getattr(self._gain, method)(0.0)
+                getattr(self._loss, method)(0.0)
+            return
+        delta = close - prev_close
+        getattr(self._gain, method)(max(delta, 0.0))
+        getattr(self._loss, method)(max(-delta, 0.0))
+
+    def update(self, close: float) -> float:
+        self._prev_close, self._last_close = self._last_close, close
+        self._feed('update', close, self._prev_close)
+        return self.value
+
+    def revise(self, close: float) -> float:
+        self._last_close = close
+        self._feed('revise', close, self._prev_close)
+        return self.value
+
+
+class ATR:
+    """Average True Range (прості середні TR, як IndicatorEngine.atr)"""
+
+    def __init__(self, period: int = 14):
+        self._tr = RollingMean(period)
+        self._last_close = None
+        self._prev_close = None
+
+    def seed(self, highs, lows, closes):
+        for h, l, c in zip(highs, lows, closes):
+            self.update(h, l, c)
+        return self
+
+    @property
+    def value(self) -> float:
+        return self._tr.value
+
+    @staticmethod
+    def true_range(high: float, low: float, prev_close) -> float:
+        return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self._prev_close, self._last_close = self._last_close, close
+        # Для першої свічки TR невизначений (немає попереднього close)
+        if self._prev_close is not None:
+            self._tr.update(self.true_range(high, low, self._prev_close))
+        return self.value
+
+    def revise(self, high: float, low: float, close: float) -> float:
+        self._last_close = close
+        if self._prev_close is not None:
+            self._tr.revise(self.true_range(high, low, self._prev_close))
+        return self.value
+
+
+class MACD:
+    """MACD: (macd_line, signal_line, histogram), як IndicatorEngine.macd"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+        self.prev_histogram = float('nan')  # гістограма попередньої закритої свічки
+        self._histogram = float('nan')
+
+    def seed(self, closes):
+        for x in closes:
+            self.update(x)
+        return self
+
+    @property
+    def value(self):
+        line = self._fast.value - self._slow.value
+        signal = self._signal.value
+        return line, signal, line - signal
+
+    def update(self, close: float):
+        self.prev_histogram = self._histogram
+        line = self._fast.update(close) - self._slow.update(close)
+        self._signal.update(line)
+        self._histogram = self.value[2]
+        return self.value
+
+    def revise(self, close: float):
+        line = self._fast.revise(close) - self._slow.revise(close)
+        self._signal.revise(line)
+        self._histogram = self.value[2]
+        return self.value
+
+
+class KeltnerBands:
+    """Канал Кельтнера стратегії: (ma, atr, upper, lower), як IndicatorEngine.keltner"""
+
+    def __init__(self, period: int = 20, atr_mult: float = 2.0):
+        self.period = period
+        self.atr_mult = atr_mult
+        self._ma = RollingMean(period)
+        self._highs = deque(maxlen=period)
+
+    def seed(self, highs, closes):
+        for h, c in zip(highs, closes):
+            self.update(h, c)
+        return self
+
+    @property
+    def value(self):
+        ma = self._ma.value
+        if len(self._highs) < self.period:
+            band = float('nan')
+        elif self.period == 1:
+            band = 0.0
+        else:
+            band = (self._highs[-1] - self._highs[0]) / (self.period - 1)
+        return ma, band, ma + band * self.atr_mult, ma - band * self.atr_mult
+
+    def update(self, high: float, close: float):
+        self._highs.append(high)
+        self._ma.update(close)
+        return self.value
+
+    def revise(self, high: float, close: float):
+        if not self._highs:
+            return self.update(high, close)
+        self._highs[-1] = high
+        self._ma.revise(close)
+        return self.value
+
+
+class StreamingIndicators:
+    """Набір потокових індикаторів для одного ряду (symbol, timeframe).
+    Дає ті самі значення, що й IndicatorEngine по всій історії."""
+
+    def __init__(self):
+        self.rsi = RSI(14)
+        self.atr = ATR(14)
+        self.ma_20 = RollingMean(20)
+        self.macd = MACD()
+        self.keltner = KeltnerBands(20, 2.0)
+        self.close = float('nan')
+        self.last_ts = None
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame) -> 'StreamingIndicators':
+        state = cls()
+        for ts, high, low, close in zip(df['ts'], df['high'].to_numpy(),
+                                        df['low'].to_numpy(), df['close'].to_numpy()):
+            state.update(high, low, close, ts)
+        return state
+
+    def update(self, high: float, low: float, close: float, ts=None):
+        """Нова свічка"""
+        self.close, self.last_ts = close, ts
+        self.rsi.update(close)
+        self.atr.update(high, low, close)
+        self.ma_20.update(close)
+        self.macd.update(close)
+        self.keltner.update(high, close)
+        return self
+
+    def revise(self, high: float, low: float, close: float):
+        """Оновлення поточної (незакритої) свічки"""
+        self.close = close
+        self.rsi.revise(close)
+        self.atr.revise(high, low, close)
+        self.ma_20.revise(close)
+        self.macd.revise(close)
+        self.keltner.revise(high, close)
+        return self
+
+    def apply(self, high: float, low: float, close: float, ts):
+        """update або revise — залежно від того, чи свічка з цим ts вже була"""
+        if self.last_ts is not None and ts == self.last_ts:
+            return self.revise(high, low, close)
+        return self.update(high, low, close, ts)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+import metrics
+from config import (
+    LOOP_LAG_THRESHOLD, LOOP_MONITOR_INTERVAL, LOOP_REPORT_PATH, LOOP_REPORT_MAX_BYTES, LOOP_REPORT_BACKUPS
+)
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = metrics.histogram('event_loop_lag_seconds', 'Event loop scheduling lag measured by the heartbeat',
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+LOOP_BLOCKS = metrics.histogram('event_loop_block_seconds', 'Event loop stalls above the threshold by handler',
+                                ('handler',))
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def callback_prefix(data: str) -> str:
+    """Перші два сегменти callback_data (menu:signal, admin:approve); id та коди — без значень"""
+    return re.sub(r'\d+', '#', ':'.join(data.split(':')[:2]))
+
+
+def _callback_label(frame) -> str:
+    data = frame.f_locals.get('data')
+    if not isinstance(data, str):
+        return 'callback_router'
+    return f'callback_router:{callback_prefix(data)}'
+
+
+def _message_label(frame) -> str:
+    return f"handle_message:{frame.f_locals.get('state') or 'none'}"
+
+
+# Обробники бота -> мітка; перший знайдений від зовнішнього кадру визначає винуватця
+HANDLERS = {
+    'callback_router': _callback_label,
+    'handle_message': _message_label,
+    'deliver_signal': lambda frame: 'deliver_signal',
+    'run_broadcast': lambda frame: 'run_broadcast',
+    'start': lambda frame: 'start',
+}
+
+
+def attribute(frame) -> str:
+    """Мітка обробника, що виконувався в кадрі frame (або найзовнішня функція проєкту)"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    fallback = None
+    for f in reversed(frames):
+        code = f.f_code
+        label = HANDLERS.get(code.co_name)
+        if label is not None and os.path.dirname(os.path.abspath(code.co_filename)) == _PROJECT_DIR:
+            return label(f)
+        if fallback is None and code.co_filename.startswith(_PROJECT_DIR) and code.co_filename != __file__:
+            fallback = f"{os.path.splitext(os.path.basename(code.co_filename))[0]}.{code.co_name}"
+    return fallback or 'unknown'
+
+
+def _report_logger(path: str) -> logging.Logger:
+    report = logging.getLogger('loop_monitor.report')
+    if not report.handlers and path:
+        handler = RotatingFileHandler(path, maxBytes=LOOP_REPORT_MAX_BYTES, backupCount=LOOP_REPORT_BACKUPS,
+                                      encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        report.addHandler(handler)
+        report.setLevel(logging.INFO)
+        report.propagate = False
+    return report
+
+
+class LoopMonitor:
+    """Watchdog блокувань event loop.
+
+    Корутина-heartbeat кожні interval секунд міряє, наскільки пізніше запланованого
+    вона прокинулась (lag). Окремий потік стежить за останнім heartbeat: якщо loop
+    не відповідає довше threshold, знімає стек потоку loop (sys._current_frames)
+    і визначає обробник бота, що його тримає. Коли loop відпускає, зупинка йде
+    в метрики (event_loop_block_seconds{handler}) і у файл звіту зі стеком."""
+
+    def __init__(self, threshold: float = LOOP_LAG_THRESHOLD, interval: float = LOOP_MONITOR_INTERVAL,
+                 report_path: str = LOOP_REPORT_PATH):
+        self.threshold = threshold
+        self.interval = interval
+        self._report = _report_logger(report_path)
+        self._beat = time.monotonic()
+        self._capture = None  # (мітка, стек), знятий watchdog під час поточної зупинки
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop_thread = None
+        self._task = None
+        self._watchdog = None
+        self.stats = {'beats': 0, 'blocks': 0, 'lag_max': 0.0, 'blocked_total': 0.0}
+        self.by_handler = {}  # мітка -> [кількість, сумарний час]
+        self.last_block = None
+
+    def start(self):
+        """Запускається з event loop, який треба стежити"""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"🩺 Loop monitor started: threshold {self.threshold}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - before - self.interval)
+            with self._lock:
+                capture, self._capture = self._capture, None
+            self.stats['beats'] += 1
+            self.stats['lag_max'] = max(self.stats['lag_max'], lag)
+            LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                self._record(lag, capture)
+
+    def _watch(self):
+        while not self._stop.wait(min(self.interval, self.threshold / 2)):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled < self.threshold or self._capture is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            # f_locals кадру чужого потоку лише читаємо (data / state обробника)
+            capture = (attribute(frame), ''.join(traceback.format_stack(frame)))
+            with self._lock:
+                if self._capture is None:
+                    self._capture = capture
+
+    def _record(self, lag: float, capture):
+        handler, stack = capture or ('unknown', '')  # зупинка коротша за період watchdog
+        LOOP_BLOCKS.observe(lag, handler=handler)
+        self.stats['blocks'] += 1
+        self.stats['blocked_total'] += lag
+        entry = self.by_handler.setdefault(handler, [0, 0.0])
+        entry[0] += 1
+        entry[1] += lag
+        self.last_block = {'handler': handler, 'lag': lag, 'at': time.time()}
+        logger.warning(f"⚠️ Event loop blocked for {lag:.3f}s in {handler}")
+        self._report.info(f"blocked {lag:.3f}s in {handler}\n{stack or '(стек не знято)'}")
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, handlers={h: {'count': c, 'seconds': s} for h, (c, s) in self.by_handler.items()})
@@ -1,6 +1,12 @@
 import ccxt
+import ccxt.async_support as ccxt_async
+import numpy as np
 import pandas as pd
+import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import Future
 from config import KRAKEN_API_KEY, KRAKEN_API_SECRET   # замінено
 
 logger = logging.getLogger(__name__)
@@ -12,23 +18,277 @@ exchange = ccxt.kraken({
     'enableRateLimit': True
 })
 
+# Асинхронний клієнт Kraken створюється ліниво — всередині event loop бота
+_async_exchange = None
+
+# Спільний кеш свічок: (symbol, timeframe, limit) -> (expires_at, df).
+# Запис живе до закриття поточної свічки таймфрейму.
+_ohlcv_cache = {}
+# Запити, які зараз виконуються: (symbol, timeframe, limit) -> Future
+_inflight = {}
+# Те саме для асинхронних запитів: (symbol, timeframe, limit) -> asyncio.Future
+_async_inflight = {}
+# Кільцеві буфери свічок: (symbol, timeframe) -> CandleBuffer.
+# Після першого повного завантаження біржу питаємо лише про нові свічки (since).
+OHLCV_BUFFER_CAPACITY = 1000
+_series = {}
+_cache_lock = threading.Lock()
+cache_stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+
+def candle_close_ts(timeframe: str, now: float = None) -> int:
+    """Unix-час (сек) закриття поточної свічки таймфрейму"""
+    tf_sec = exchange.parse_timeframe(timeframe)
+    now = time.time() if now is None else now
+    return (int(now) // tf_sec + 1) * tf_sec
+
+
+def get_cache_stats() -> dict:
+    """Повертає лічильники кешу OHLCV (hits / misses / coalesced)"""
+    with _cache_lock:
+        return dict(cache_stats, entries=len(_ohlcv_cache),
+                    inflight=len(_inflight) + len(_async_inflight))
+
+
+def clear_cache():
+    """Очищає кеш OHLCV і буфери свічок (лічильники не скидаються)"""
+    with _cache_lock:
+        _ohlcv_cache.clear()
+        _series.clear()
+
+
+def get_async_exchange():
+    """Повертає спільний асинхронний клієнт Kraken (ccxt.async_support)"""
+    global _async_exchange
+    if _async_exchange is None:
+        _async_exchange = ccxt_async.kraken({
+            'apiKey': KRAKEN_API_KEY,
+            'secret': KRAKEN_API_SECRET,
+            'enableRateLimit': True
+        })
+    return _async_exchange
+
+
+async def close_async_exchange():
+    """Закриває HTTP-сесію асинхронного клієнта (при зупинці бота)"""
+    global _async_exchange
+    if _async_exchange is not None:
+        await _async_exchange.close()
+        _async_exchange = None
+
+
+class CandleBuffer:
+    """Кільцевий буфер свічок фіксованої ємності для однієї пари (symbol, timeframe).
+    Рядок: [ts_ms, open, high, low, close, volume]."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.empty((capacity, 6), dtype=np.float64)
+        self._start = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def last_ts(self):
+        if not self.count:
+            return None
+        return int(self._data[(self._start + self.count - 1) % self.capacity, 0])
+
+    def merge(self, bars) -> int:
+        """Додає нові свічки; свічка з тим самим ts, що й остання (ще не закрита),
+        замінюється. Повертає кількість доданих/оновлених рядків."""
+        merged = 0
+        for bar in bars:
+            last_ts = self.last_ts
+            ts = bar[0]
+            if last_ts is not None and ts < last_ts:
+                continue
+            if last_ts is not None and ts == last_ts:
+                idx = (self._start + self.count - 1) % self.capacity
+            elif self.count < self.capacity:
+                idx = (self._start + self.count) % self.capacity
+                self.count += 1
+            else:
+                # Буфер повний — перезаписуємо найстарішу свічку
+                idx = self._start
+                self._start = (self._start + 1) % self.capacity
+            self._data[idx] = bar[:6]
+            merged += 1
+        return merged
+
+    def clear(self):
+        self._start = 0
+        self.count = 0
+
+    def tail(self, n: int) -> np.ndarray:
+        n = min(n, self.count)
+        idx = (self._start + np.arange(self.count - n, self.count)) % self.capacity
+        return self._data[idx]
+
+
+def _get_buffer(symbol: str, timeframe: str, limit: int) -> CandleBuffer:
+    key = (symbol, timeframe)
+    with _cache_lock:
+        buf = _series.get(key)
+        if buf is None or buf.capacity < limit:
+            buf = CandleBuffer(max(OHLCV_BUFFER_CAPACITY, limit))
+            _series[key] = buf
+        return buf
+
+
+def _refresh_since(buf: CandleBuffer, limit: int):
+    """ts, з якого треба довантажити свічки, або None — якщо потрібна повна історія"""
+    with buf.lock:
+        if buf.count < limit:
+            return None
+        return buf.last_ts
+
+
+def _merge_bars(symbol: str, timeframe: str, limit: int, buf: CandleBuffer, since, bars):
+    """Зливає свічки в буфер і повертає df останніх limit свічок.
+    None — якщо між буфером і новими свічками розрив (потрібне повне завантаження)."""
+    with buf.lock:
+        if since is not None and bars and bars[0][0] > since:
+            # Біржа вже не віддає останню збережену свічку — історія застаріла
+            buf.clear()
+            return None
+        if since is None:
+            # Повне завантаження замінює буфер: merge не дописує свічки, старші за останню,
+            # тож інакше історія, знята з меншим limit, ніколи б не доповнилась
+            buf.clear()
+        buf.merge(bars or [])
+        rows = buf.tail(limit)
+
+    if len(rows) < 2:
+        raise ValueError(f"❌ Недостатньо даних для {symbol}")
+
+    df = pd.DataFrame(rows, columns=['ts', 'open', 'high', 'low', 'close', 'volume'])
+    df['ts'] = pd.to_datetime(df['ts'].astype('int64'), unit='ms')
+    mode = 'full' if since is None else f'+{len(bars or [])}'
+    logger.info(f"✅ Дані завантажені: {symbol} {timeframe} ({len(df)} свічок, {mode})")
+    return df
+
+
+def _download_ohlcv(symbol: str, timeframe: str, limit: int) -> pd.DataFrame:
+    buf = _get_buffer(symbol, timeframe, limit)
+    since = _refresh_since(buf, limit)
+    if since is None:
+        bars = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+    else:
+        # Лише свічки від останньої збереженої (включно — вона могла ще формуватись)
+        bars = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since)
+    df = _merge_bars(symbol, timeframe, limit, buf, since, bars)
+    if df is None:
+        bars = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+        df = _merge_bars(symbol, timeframe, limit, buf, None, bars)
+    return df
+
+
+async def _download_ohlcv_async(symbol: str, timeframe: str, limit: int) -> pd.DataFrame:
+    buf = _get_buffer(symbol, timeframe, limit)
+    since = _refresh_since(buf, limit)
+    if since is None:
+        bars = await get_async_exchange().fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+    else:
+        bars = await get_async_exchange().fetch_ohlcv(symbol, timeframe=timeframe, since=since)
+    df = _merge_bars(symbol, timeframe, limit, buf, since, bars)
+    if df is None:
+        bars = await get_async_exchange().fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+        df = _merge_bars(symbol, timeframe, limit, buf, None, bars)
+    return df
+
+
 def fetch_ohlcv(symbol: str = 'BTC/USDT', timeframe: str = '2h', limit: int = 200):
     try:
         if not symbol or '/' not in symbol:
             raise ValueError(f"❌ Неправильний формат символу: {symbol}")
-        
-        bars = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
-        
-        if not bars or len(bars) < 2:
-            raise ValueError(f"❌ Недостатньо даних для {symbol}")
-        
-        df = pd.DataFrame(bars, columns=['ts', 'open', 'high', 'low', 'close', 'volume'])
-        df['ts'] = pd.to_datetime(df['ts'], unit='ms')
-        logger.info(f"✅ Дані завантажені: {symbol} {timeframe} ({len(df)} свічок)")
+
+        key = (symbol, timeframe, limit)
+        with _cache_lock:
+            entry = _ohlcv_cache.get(key)
+            if entry and entry[0] > time.time():
+                cache_stats['hits'] += 1
+                # Стратегії дописують колонки в df — віддаємо копію
+                return entry[1].copy()
+            pending = _inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                _inflight[key] = pending
+                cache_stats['misses'] += 1
+            else:
+                cache_stats['coalesced'] += 1
+
+        if not owner:
+            # Чекаємо на вже запущений запит замість власного
+            return pending.result().copy()
+
+        try:
+            df = _download_ohlcv(symbol, timeframe, limit)
+            with _cache_lock:
+                _ohlcv_cache[key] = (candle_close_ts(timeframe), df)
+            pending.set_result(df)
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with _cache_lock:
+                _inflight.pop(key, None)
+        return df.copy()
+    except ccxt.ExchangeError as e:
+        logger.error(f"❌ Exchange error: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"❌ Fetch OHLCV error: {e}")
+        raise
+
+
+async def _download_shared(key) -> pd.DataFrame:
+    symbol, timeframe, limit = key
+    try:
+        df = await _download_ohlcv_async(symbol, timeframe, limit)
+        with _cache_lock:
+            _ohlcv_cache[key] = (candle_close_ts(timeframe), df)
         return df
+    finally:
+        with _cache_lock:
+            _async_inflight.pop(key, None)
+
+
+def _retrieve_exception(task):
+    # Щоб asyncio не скаржився на непрочитаний виняток, коли очікувачів не лишилось
+    if not task.cancelled():
+        task.exception()
+
+
+async def fetch_ohlcv_async(symbol: str = 'BTC/USDT', timeframe: str = '2h', limit: int = 200):
+    """Асинхронна версія fetch_ohlcv — той самий кеш, не блокує event loop"""
+    try:
+        if not symbol or '/' not in symbol:
+            raise ValueError(f"❌ Неправильний формат символу: {symbol}")
+
+        key = (symbol, timeframe, limit)
+        with _cache_lock:
+            entry = _ohlcv_cache.get(key)
+            if entry and entry[0] > time.time():
+                cache_stats['hits'] += 1
+                return entry[1].copy()
+            pending = _async_inflight.get(key)
+            if pending is None:
+                # Завантаження — окрема задача, не прив'язана до жодного викликача:
+                # скасування того, хто його почав, не скасовує запит для інших
+                pending = asyncio.ensure_future(_download_shared(key))
+                pending.add_done_callback(_retrieve_exception)
+                _async_inflight[key] = pending
+                cache_stats['misses'] += 1
+            else:
+                cache_stats['coalesced'] += 1
+
+        # shield — скасування одного очікувача не скасовує спільний запит
+        return (await asyncio.shield(pending)).copy()
     except ccxt.ExchangeError as e:
         logger.error(f"❌ Exchange error: {e}")
         raise
     except Exception as e:
         logger.error(f"❌ Fetch OHLCV error: {e}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,179 @@
+import bisect
+import logging
+import multiprocessing
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Межі бакетів (сек): від мілісекунд (індикатори) до години (відкладена доставка)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 1800, 3600)
+
+# У процесах пулу (spawn) спостереження не пишуться в гістограми, а накопичуються
+# і повертаються батьківському процесу разом із результатом (див. workers._timed_call).
+# Перевіряється під час запису: при spawn модуль імпортується ще до того, як процес знає батька
+_forwarded = []
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Гістограма з мітками у форматі Prometheus (cumulative buckets, _sum, _count)"""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # значення міток -> [лічильники бакетів..., +Inf], sum
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def observe(self, value: float, **labels):
+        values = self._label_values(labels)
+        if multiprocessing.parent_process() is not None:
+            _forwarded.append((self.name, values, value))
+            return
+        self._observe(values, value)
+
+    def _observe(self, values: tuple, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Span: міряє тривалість блоку (у тому числі з await усередині)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in sorted(series):
+            labels = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, values))
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {total}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+_histograms = {}
+_collectors = {}  # префікс -> fn() -> dict з числами (get_stats модулів)
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(name, documentation, labelnames, buckets)
+        return _histograms[name]
+
+
+def register_collector(prefix: str, fn):
+    """Числові значення з fn() віддаються як gauge <prefix>_<ключ> (вкладені словники — через _)"""
+    with _registry_lock:
+        _collectors[prefix] = fn
+
+
+def drain_forwarded() -> list:
+    """Спостереження, накопичені в процесі пулу з моменту попереднього виклику"""
+    items = _forwarded[:]
+    del _forwarded[:len(items)]
+    return items
+
+
+def record_forwarded(items):
+    for name, values, value in items or ():
+        hist = _histograms.get(name)
+        if hist is not None:
+            hist._observe(values, value)
+
+
+def _flatten(prefix: str, stats: dict, out: list):
+    for key, value in stats.items():
+        name = re.sub(r'[^a-zA-Z0-9_]', '_', f'{prefix}_{key}')
+        if isinstance(value, dict):
+            _flatten(name, value, out)
+        elif isinstance(value, bool):
+            out.append((name, int(value)))
+        elif isinstance(value, (int, float)):
+            out.append((name, value))
+
+
+def render() -> str:
+    """Усі метрики у текстовому форматі Prometheus"""
+    lines = []
+    with _registry_lock:
+        histograms = list(_histograms.values())
+        collectors = list(_collectors.items())
+    for hist in histograms:
+        lines.extend(hist.render())
+    for prefix, fn in collectors:
+        try:
+            gauges = []
+            _flatten(prefix, fn(), gauges)
+        except Exception as e:
+            logger.warning(f"⚠️ Metrics collector {prefix} failed: {type(e).__name__} - {e}")
+            continue
+        for name, value in gauges:
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # без рядка в лог на кожен scrape
+
+
+def start_http_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Піднімає /metrics у фоновому потоці процесу бота"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"📈 Metrics: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# Етапи генерації сигналу: fetch, strategy, indicators, chart
+SIGNAL_STAGES = histogram('signal_stage_seconds', 'Duration of signal generation stages',
+                          ('stage', 'symbol', 'timeframe', 'strategy'))
+# Етапи доставки: scheduled_delay (випадкова затримка), queue_wait (запізнення воркера),
+# pick (пошук/вибір сигналу), send (відправка в Telegram)
+DELIVERY_STAGES = histogram('delivery_stage_seconds', 'Duration of signal delivery stages', ('stage',))
+# Вихідна черга Telegram: очікування в черзі та сам запит
+SEND_QUEUE_WAIT = histogram('telegram_queue_wait_seconds', 'Time requests spend in the send queue', ('lane',))
+SEND_LATENCY = histogram('telegram_request_seconds', 'Telegram Bot API request duration', ('endpoint', 'lane'))
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+import ccxt
+import numpy as np
+import market_fetcher
+
+logger = logging.getLogger(__name__)
+
+
+def _key(symbol: str, timeframe: str) -> str:
+    # Ключ масиву в .npz: 'BTC-USDT@1h'
+    return f"{symbol.replace('/', '-')}@{timeframe}"
+
+
+def _parse_key(key: str) -> tuple:
+    symbol, timeframe = key.rsplit('@', 1)
+    return symbol.replace('-', '/'), timeframe
+
+
+def save_recording(path: str, series: dict):
+    """series: (symbol, timeframe) -> масив (n, 6) [ts_ms, open, high, low, close, volume]"""
+    np.savez_compressed(path, **{_key(s, tf): np.asarray(bars, dtype=np.float64) for (s, tf), bars in series.items()})
+
+
+def load_recording(path: str) -> dict:
+    with np.load(path) as data:
+        return {_parse_key(key): data[key] for key in data.files}
+
+
+def record(exchange, symbols, timeframes, path: str, limit: int = 1000) -> dict:
+    """Один раз знімає свічки з реальної біржі (ccxt) у файл для подальшого replay"""
+    series = {}
+    for symbol in symbols:
+        for timeframe in timeframes:
+            bars = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+            series[(symbol, timeframe)] = np.asarray(bars, dtype=np.float64)
+            logger.info(f"📼 Recorded {symbol} {timeframe}: {len(bars)} candles")
+    save_recording(path, series)
+    return series
+
+
+def synthesize(symbols, timeframes, rows: int = 2000, end_ms: int = None, seed: int = 42) -> dict:
+    """Синтетичний запис (випадкове блукання) — коли реального знімка немає"""
+    rng = np.random.default_rng(seed)
+    end_ms = int(time.time() * 1000) if end_ms is None else end_ms
+    series = {}
+    for symbol in symbols:
+        base = 10 ** rng.uniform(-1, 4.5)
+        for timeframe in timeframes:
+            tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+            ts = (end_ms // tf_ms - rows + 1 + np.arange(rows)) * tf_ms
+            close = base * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+            open_ = np.concatenate(([close[0]], close[:-1]))
+            spread = close * rng.random(rows) * 0.01
+            series[(symbol, timeframe)] = np.column_stack([
+                ts, open_, np.maximum(open_, close) + spread, np.minimum(open_, close) - spread,
+                close, rng.random(rows) * 100,
+            ])
+    return series
+
+
+class SimClock:
+    """Симульований ринковий час (мс): стартує з start_ms і йде в speed разів швидше за реальний.
+    speed=0 — годинник стоїть, його рухає лише advance()."""
+
+    def __init__(self, start_ms: int, speed: float = 1.0):
+        self.start_ms = start_ms
+        self.speed = speed
+        self._offset = 0.0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def now_ms(self) -> int:
+        with self._lock:
+            elapsed = (time.monotonic() - self._started) * self.speed
+            return int(self.start_ms + (elapsed + self._offset) * 1000)
+
+    def advance(self, seconds: float):
+        with self._lock:
+            self._offset += seconds
+
+
+class ReplayExchange:
+    """Замінник ccxt.kraken для market_fetcher: віддає записані свічки до поточного
+    симульованого часу (нові свічки «з'являються», коли годинник іде вперед).
+
+    latency — середня затримка відповіді (сек, ±jitter частка), error_rate — ймовірність
+    ccxt.NetworkError на запит."""
+
+    def __init__(self, series: dict, clock: SimClock = None, history: int = 300, speed: float = 0.0,
+                 latency: float = 0.0, jitter: float = 0.5, error_rate: float = 0.0, seed: int = None):
+        self.series = {k: np.asarray(v, dtype=np.float64) for k, v in series.items()}
+        if clock is None:
+            # Старт так, щоб для кожної пари вже було history закритих свічок
+            start = max(bars[min(history, len(bars) - 1), 0] for bars in self.series.values())
+            clock = SimClock(int(start), speed)
+        self.clock = clock
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'errors': 0, 'bars': 0}
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs):
+        return cls(load_recording(path), **kwargs)
+
+    @property
+    def symbols(self) -> list:
+        return sorted({symbol for symbol, _ in self.series})
+
+    @staticmethod
+    def parse_timeframe(timeframe: str) -> int:
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.stats['calls'] += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.stats['errors'] += 1
+                raise ccxt.NetworkError('replay: injected network error')
+            if not self.latency:
+                return 0.0
+            return max(0.0, self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+    def _bars(self, symbol, timeframe, since=None, limit=None) -> list:
+        bars = self.series.get((symbol, timeframe))
+        if bars is None:
+            raise ccxt.BadSymbol(f'replay: no recording for {symbol} {timeframe}')
+        # Видно лише свічки, що відкрились до поточного симульованого часу
+        end = int(np.searchsorted(bars[:, 0], self.clock.now_ms(), side='right'))
+        if since is not None:
+            begin = int(np.searchsorted(bars[:, 0], since, side='left'))
+            rows = bars[begin:end] if limit is None else bars[begin:min(end, begin + limit)]
+        else:
+            rows = bars[max(0, end - (limit or 720)):end]
+        with self._lock:
+            self.stats['bars'] += len(rows)
+        return rows.tolist()
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._bars(symbol, timeframe, since, limit)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+class AsyncReplayExchange(ReplayExchange):
+    """Те саме для ccxt.async_support (fetch_ohlcv_async, find_signal)"""
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._bars(symbol, timeframe, since, limit)
+
+    async def close(self):
+        pass
+
+
+@contextmanager
+def installed(sync_exchange: ReplayExchange = None, async_exchange: AsyncReplayExchange = None):
+    """Тимчасово підміняє біржу в market_fetcher (кеш свічок очищається на вході й виході)"""
+    saved = market_fetcher.exchange, market_fetcher._async_exchange
+    market_fetcher.clear_cache()
+    if sync_exchange is not None:
+        market_fetcher.exchange = sync_exchange
+    if async_exchange is not None:
+        market_fetcher._async_exchange = async_exchange
+    try:
+        yield
+    finally:
+        market_fetcher.exchange, market_fetcher._async_exchange = saved
+        market_fetcher.clear_cache()
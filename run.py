@@ -1,6 +1,5 @@
 import sys
 import logging
-import threading
 from config import TG_BOT_TOKEN, KRAKEN_API_KEY, KRAKEN_API_SECRET, GEMINI_API_KEY
 
 # Налаштувати логування — показувати тільки найважливіше
@@ -40,15 +39,9 @@ def main():
     
     try:
         from bot import main as run_bot
-        from api_checker import schedule_daily_reset
         
         logger.info("🚀 Запуск AI Crypto Indicator Bot...")
         
-        # Щоденний скид сигналів
-        reset_thread = threading.Thread(target=schedule_daily_reset, daemon=True)
-        reset_thread.start()
-        logger.info("🔄 Daily reset scheduler запущено")
-        
         # Бот в головному потоці
         run_bot()
     except KeyboardInterrupt:
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from config import FETCH_CONCURRENCY, SCANNER_DELAY
+from indicators import StreamingIndicators
+from market_fetcher import fetch_ohlcv_async, candle_close_ts
+from signal_generator import (
+    TIMEFRAMES, STRATEGIES, Signal, stream_strategy, make_signal, render_chart
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReadySignal:
+    signal: Signal
+    expires_at: int  # закриття свічки, на якій знайдено сигнал
+
+    def is_valid(self, now: float = None) -> bool:
+        return (time.time() if now is None else now) < self.expires_at
+
+
+class SignalScanner:
+    """Фоновий сканер: після закриття свічки проходить symbols × timeframes × strategies
+    і тримає пул актуальних (не-NEUTRAL) сигналів до закриття їхньої свічки."""
+
+    def __init__(self, symbols, timeframes=TIMEFRAMES, strategies=STRATEGIES,
+                 max_concurrency=FETCH_CONCURRENCY, delay=SCANNER_DELAY):
+        self.symbols = list(symbols)
+        self.timeframes = list(timeframes)
+        self.strategies = list(strategies)
+        self.max_concurrency = max(1, max_concurrency)
+        self.delay = delay
+        self.pool = {}    # (symbol, timeframe, strategy) -> ReadySignal
+        self._states = {}  # (symbol, timeframe) -> StreamingIndicators
+        self._frames = {}  # (symbol, timeframe) -> останній df (для лінивого графіка)
+        self.stats = {'scans': 0, 'series': 0, 'errors': 0, 'signals': 0, 'taken': 0}
+
+    def _update_state(self, symbol, timeframe, df) -> StreamingIndicators:
+        key = (symbol, timeframe)
+        state = self._states.get(key)
+        if state is None or state.last_ts is None or state.last_ts < df['ts'].iloc[0]:
+            state = StreamingIndicators.from_df(df)
+            self._states[key] = state
+            return state
+        # Лише свічки, новіші за вже враховані (остання — ревізія незакритої)
+        fresh = df[df['ts'] >= state.last_ts]
+        for ts, high, low, close in zip(fresh['ts'], fresh['high'].to_numpy(),
+                                        fresh['low'].to_numpy(), fresh['close'].to_numpy()):
+            state.apply(high, low, close, ts)
+        return state
+
+    async def _scan_series(self, symbol, timeframe, semaphore):
+        async with semaphore:
+            df = await fetch_ohlcv_async(symbol, timeframe=timeframe, limit=300)
+        state = self._update_state(symbol, timeframe, df)
+        expires_at = candle_close_ts(timeframe)
+
+        self._frames[(symbol, timeframe)] = df
+        atr_val = round(state.atr.value, 8)
+        for strategy in self.strategies:
+            key = (symbol, timeframe, strategy)
+            result = stream_strategy(strategy, state)
+            if result[0] == 'NEUTRAL':
+                self.pool.pop(key, None)
+                continue
+            signal = make_signal(symbol, timeframe, strategy, result, atr_val,
+                                 state.rsi.value, state.ma_20.value, state.close)
+            self.pool[key] = ReadySignal(signal, expires_at)
+            self.stats['signals'] += 1
+
+    async def scan(self, timeframes=None):
+        """Одна повна перевірка для вказаних таймфреймів"""
+        timeframes = timeframes or self.timeframes
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        series = [(sym, tf) for tf in timeframes for sym in self.symbols]
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(self._scan_series(sym, tf, semaphore) for sym, tf in series),
+            return_exceptions=True
+        )
+        for (sym, tf), res in zip(series, results):
+            if isinstance(res, Exception):
+                self.stats['errors'] += 1
+                logger.warning(f"⚠️ Scanner: {sym} {tf} failed - {type(res).__name__} - {res}")
+        self.purge()
+        self.stats['scans'] += 1
+        self.stats['series'] += len(series)
+        logger.info(f"🛰️ Scanner: {len(series)} series ({', '.join(timeframes)}) in "
+                    f"{time.monotonic() - started:.1f}s, ready signals: {len(self.pool)}")
+
+    def purge(self, now: float = None):
+        now = time.time() if now is None else now
+        for key in [k for k, ready in self.pool.items() if not ready.is_valid(now)]:
+            del self.pool[key]
+        live = {(sym, tf) for sym, tf, _ in self.pool}
+        for key in [k for k in self._frames if k not in live]:
+            del self._frames[key]
+
+    async def take(self):
+        """Випадковий актуальний Signal з пулу або None — без звернень до біржі
+        й перерахунку індикаторів. Графік рендериться лише при першій видачі."""
+        self.purge()
+        if not self.pool:
+            return None
+        ready = random.choice(list(self.pool.values()))
+        signal = ready.signal
+        df = self._frames.get((signal.symbol, signal.timeframe))
+        if signal.chart is None and df is not None:
+            await render_chart(signal, df)
+        self.stats['taken'] += 1
+        return signal
+
+    async def run(self):
+        """Нескінченний цикл: повне сканування на старті, далі — після закриття свічок"""
+        logger.info(f"🛰️ Scanner started: {len(self.symbols)} symbols × {self.timeframes}")
+        await self._safe_scan(self.timeframes)
+        while True:
+            now = time.time()
+            closes = {tf: candle_close_ts(tf, now) for tf in self.timeframes}
+            next_close = min(closes.values())
+            await asyncio.sleep(max(0, next_close - now) + self.delay)
+            due = [tf for tf, ts in closes.items() if ts == next_close]
+            await self._safe_scan(due)
+
+    async def _safe_scan(self, timeframes):
+        try:
+            await self.scan(timeframes)
+        except Exception as e:
+            logger.error(f"❌ Scanner error: {type(e).__name__} - {e}")
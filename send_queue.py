@@ -0,0 +1,241 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import metrics
+from collections import deque
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from config import (
+    SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_GROUP_RATE, SEND_CHAT_BURST,
+    SEND_MAX_INFLIGHT, SEND_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Пріоритети (rate_limit_args у методах бота): відповіді користувачу йдуть поза чергою
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+LANES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BULK: 'bulk'}
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """rate токенів/сек, не більше capacity; один токен — один запит"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Скільки чекати до наступного токена (0 — можна зараз)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ('priority', 'chat_id', 'endpoint', 'callback', 'args', 'kwargs', 'future', 'enqueued', 'attempts')
+
+    def __init__(self, priority, chat_id, endpoint, callback, args, kwargs, future):
+        self.priority = priority
+        self.chat_id = chat_id
+        self.endpoint = endpoint
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+def _is_group(chat_id) -> bool:
+    return isinstance(chat_id, str) or chat_id < 0
+
+
+def _seconds(retry_after) -> float:
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+
+
+class SendQueue(BaseRateLimiter):
+    """Вихідна черга запитів до Telegram (підключається через ApplicationBuilder.rate_limiter).
+
+    Усі запити з chat_id проходять через диспетчер: загальний token bucket (~30/с)
+    і окремий на кожен чат (~1/с, для груп ~20/хв). Дві смуги пріоритету:
+    інтерактивні відповіді обганяють масові розсилки; всередині смуги й чату — FIFO.
+    На RetryAfter диспетчер ставить на паузу всю відправку на вказаний час
+    і повертає запит у чергу (до SEND_MAX_RETRIES разів).
+
+    Приклад масової відправки: await bot.send_message(..., rate_limit_args=PRIORITY_BULK)"""
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 group_rate: float = SEND_GROUP_RATE, chat_burst: int = SEND_CHAT_BURST,
+                 max_inflight: int = SEND_MAX_INFLIGHT, max_retries: int = SEND_MAX_RETRIES):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_inflight = max(1, max_inflight)
+        self.max_retries = max_retries
+        self._seq = itertools.count()
+        self._ready = []    # (priority, seq, job)
+        self._waiting = []  # (ready_at, seq, job) — чекають на ліміт свого чату
+        self._chats = {}    # chat_id -> TokenBucket
+        self._global = None
+        self._paused_until = 0.0
+        self._wake = None
+        self._inflight = None
+        self._task = None
+        self._depth = {p: 0 for p in LANES}
+        self._latency = {p: deque(maxlen=1000) for p in LANES}
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'retry_after': 0, 'deferred': 0, 'bypassed': 0}
+
+    async def initialize(self):
+        self._global = TokenBucket(self.global_rate, self.global_rate, time.monotonic())
+        self._wake = asyncio.Event()
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        self._task = asyncio.create_task(self._dispatch())
+        logger.info(f"📮 Send queue started: {self.global_rate:g} msg/s global, {self.chat_rate:g} msg/s per chat")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for _, _, job in self._ready + self._waiting:
+            if not job.future.done():
+                job.future.cancel()
+        self._ready.clear()
+        self._waiting.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        if chat_id is None or self._task is None:
+            # getUpdates, answerCallbackQuery тощо не рахуються в ліміти повідомлень
+            self.stats['bypassed'] += 1
+            return await callback(*args, **kwargs)
+        priority = rate_limit_args if rate_limit_args in LANES else PRIORITY_INTERACTIVE
+        job = _Job(priority, chat_id, endpoint, callback, args, kwargs, asyncio.get_running_loop().create_future())
+        self._push(job)
+        return await job.future
+
+    def _push(self, job):
+        heapq.heappush(self._ready, (job.priority, next(self._seq), job))
+        self._depth[job.priority] += 1
+        self._wake.set()
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                # Повні відра нічим не відрізняються від нових — їх можна прибрати
+                self._chats = {k: b for k, b in self._chats.items() if not b.is_full(now)}
+            rate = self.group_rate if _is_group(chat_id) else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst, now)
+        return bucket
+
+    async def _dispatch(self):
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, seq, job = heapq.heappop(self._waiting)
+                heapq.heappush(self._ready, (job.priority, seq, job))
+
+            timeout = None
+            if self._paused_until > now:
+                timeout = self._paused_until - now
+            elif self._ready:
+                global_wait = self._global.wait_time(now)
+                if global_wait > 0:
+                    timeout = global_wait
+                else:
+                    _, seq, job = heapq.heappop(self._ready)
+                    if job.future.done():  # викликач уже скасував запит
+                        self._depth[job.priority] -= 1
+                        continue
+                    bucket = self._chat_bucket(job.chat_id, now)
+                    chat_wait = bucket.wait_time(now)
+                    if chat_wait > 0:
+                        heapq.heappush(self._waiting, (now + chat_wait, seq, job))
+                        self.stats['deferred'] += 1
+                        continue
+                    self._global.take(now)
+                    bucket.take(now)
+                    await self._inflight.acquire()
+                    asyncio.create_task(self._send(job))
+                    continue
+
+            if self._waiting:
+                until_ready = self._waiting[0][0] - now
+                timeout = until_ready if timeout is None else min(timeout, until_ready)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, job):
+        lane = LANES[job.priority]
+        started = time.monotonic()
+        metrics.SEND_QUEUE_WAIT.observe(started - job.enqueued, lane=lane)
+        try:
+            result = await job.callback(*job.args, **job.kwargs)
+        except RetryAfter as e:
+            delay = _seconds(e.retry_after)
+            self.stats['retry_after'] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            logger.warning(f"⚠️ Telegram flood limit: pausing sends for {delay:g}s (chat {job.chat_id})")
+            if job.attempts < self.max_retries and not job.future.done():
+                job.attempts += 1
+                self.stats['retried'] += 1
+                self._depth[job.priority] -= 1
+                self._push(job)
+            else:
+                self._finish(job, error=e)
+        except Exception as e:
+            self._finish(job, error=e)
+        else:
+            self._finish(job, result=result)
+        finally:
+            metrics.SEND_LATENCY.observe(time.monotonic() - started, endpoint=job.endpoint, lane=lane)
+            self._inflight.release()
+
+    def _finish(self, job, result=None, error=None):
+        self._depth[job.priority] -= 1
+        if error is not None:
+            self.stats['failed'] += 1
+        else:
+            self.stats['sent'] += 1
+            self._latency[job.priority].append(time.monotonic() - job.enqueued)
+        if job.future.done():
+            return
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats, waiting_for_chat=len(self._waiting), chats=len(self._chats),
+                     paused_for=max(0.0, self._paused_until - time.monotonic()))
+        for priority, lane in LANES.items():
+            samples = sorted(self._latency[priority])
+            stats[f'{lane}_depth'] = self._depth[priority]
+            stats[f'{lane}_latency_avg'] = sum(samples) / len(samples) if samples else 0.0
+            stats[f'{lane}_latency_p95'] = samples[int(len(samples) * 0.95) - 1] if samples else 0.0
+            stats[f'{lane}_latency_max'] = samples[-1] if samples else 0.0
+        return stats
@@ -1,34 +1,31 @@
-import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from io import BytesIO
+import asyncio
 import logging
+from dataclasses import dataclass, field
 from datetime import datetime
-from market_fetcher import fetch_ohlcv
+from market_fetcher import fetch_ohlcv, fetch_ohlcv_async
+from config import FETCH_CONCURRENCY
+from workers import run_cpu
+from indicators import IndicatorEngine, StreamingIndicators
+import chart_cache
+import metrics
+from chart_renderer import render_png
 import random
 
 logger = logging.getLogger(__name__)
 
-def rsi(series: pd.Series, period: int = 14) -> pd.Series:
-    delta = series.diff()
-    gain = delta.clip(lower=0).fillna(0)
-    loss = -delta.clip(upper=0).fillna(0)
-    avg_gain = gain.rolling(period).mean()
-    avg_loss = loss.rolling(period).mean()
-    rs = avg_gain / (avg_loss + 1e-9)
-    return 100 - (100 / (1 + rs))
+def rsi(series: pd.Series, period: int = 14, engine: IndicatorEngine = None) -> pd.Series:
+    engine = engine or IndicatorEngine(series.to_numpy())
+    return pd.Series(engine.rsi(period), index=series.index)
 
 
-def atr(df: pd.DataFrame, period: int = 14) -> float:
+def atr(df: pd.DataFrame, period: int = 14, engine: IndicatorEngine = None) -> float:
     """Обчислює Average True Range"""
-    df['tr'] = np.maximum(
-        df['high'] - df['low'],
-        np.maximum(
-            abs(df['high'] - df['close'].shift(1)),
-            abs(df['low'] - df['close'].shift(1))
-        )
-    )
-    atr_val = df['tr'].rolling(period).mean().iloc[-1]
+    engine = engine or IndicatorEngine.from_df(df)
+    # Як і початкова версія, навмисно дописує колонку tr у df (як keltner_breakout — ma/atr/upper/lower)
+    df['tr'] = engine.true_range
+    atr_val = engine.atr(period)[-1]
     return round(atr_val, 8)
 
 def calculate_tp_sl(entry: float, signal_type: str) -> tuple:
@@ -57,24 +54,7 @@ def calculate_tp_sl(entry: float, signal_type: str) -> tuple:
 
     return tp, sl, round(reward_pct, 2), rr
 
-def keltner_breakout(df: pd.DataFrame):
-    """Стратегія Keltner Channel Breakout"""
-    period = 20
-    atr_mult = 2.0
-    
-    df['ma'] = df['close'].rolling(period).mean()
-    df['atr'] = df['high'].rolling(period).apply(
-        lambda arr: float(np.mean(np.diff(arr))) if len(arr) > 1 else 0.0,
-        raw=True
-    )
-    
-    df['upper'] = df['ma'] + (df['atr'] * atr_mult)
-    df['lower'] = df['ma'] - (df['atr'] * atr_mult)
-    
-    close = df['close'].iloc[-1]
-    upper = df['upper'].iloc[-1]
-    lower = df['lower'].iloc[-1]
-    
+def _keltner_decision(close, upper, lower):
     if close > upper:
         tp, sl, roi_pct, rr = calculate_tp_sl(close, 'BUY')
         return 'BUY', close, tp, sl, roi_pct, rr
@@ -84,27 +64,28 @@ def keltner_breakout(df: pd.DataFrame):
     else:
         return 'NEUTRAL', close, close * 1.01, close * 0.99, 0, 0
 
-def macd(series: pd.Series, fast=12, slow=26, signal=9):
-    """Обчислює MACD"""
-    ema_fast = series.ewm(span=fast).mean()
-    ema_slow = series.ewm(span=slow).mean()
-    macd_line = ema_fast - ema_slow
-    signal_line = macd_line.ewm(span=signal).mean()
-    histogram = macd_line - signal_line
-    return macd_line, signal_line, histogram
-
-def macd_strategy(df: pd.DataFrame):
-    """MACD Based Strategy"""
-    close = df['close']
-    macd_line, signal_line, histogram = macd(close)
-    
-    last_macd = macd_line.iloc[-1]
-    last_signal = signal_line.iloc[-1]
-    last_hist = histogram.iloc[-1]
-    prev_hist = histogram.iloc[-2] if len(histogram) > 1 else 0
+def keltner_breakout(df: pd.DataFrame, engine: IndicatorEngine = None):
+    """Стратегія Keltner Channel Breakout"""
+    period = 20
+    atr_mult = 2.0
     
-    current_price = close.iloc[-1]
+    engine = engine or IndicatorEngine.from_df(df)
+    df['ma'], df['atr'], df['upper'], df['lower'] = engine.keltner(period, atr_mult)
     
+    close = engine.close[-1]
+    upper = df['upper'].iloc[-1]
+    lower = df['lower'].iloc[-1]
+    return _keltner_decision(close, upper, lower)
+
+def macd(series: pd.Series, fast=12, slow=26, signal=9, engine: IndicatorEngine = None):
+    """Обчислює MACD"""
+    engine = engine or IndicatorEngine(series.to_numpy())
+    macd_line, signal_line, histogram = engine.macd(fast, slow, signal)
+    return (pd.Series(macd_line, index=series.index),
+            pd.Series(signal_line, index=series.index),
+            pd.Series(histogram, index=series.index))
+
+def _macd_decision(current_price, last_macd, last_signal, last_hist, prev_hist):
     if last_macd > last_signal and prev_hist < 0 and last_hist > 0:
         tp, sl, roi_pct, rr = calculate_tp_sl(current_price, 'BUY')
         return 'BUY', current_price, tp, sl, roi_pct, rr
@@ -114,13 +95,20 @@ def macd_strategy(df: pd.DataFrame):
     else:
         return 'NEUTRAL', current_price, current_price * 1.01, current_price * 0.99, 0, 0
 
-def rsi_strategy(df: pd.DataFrame):
-    """RSI Based Strategy (Overbought/Oversold)"""
-    close = df['close']
-    rsi_vals = rsi(close, period=14)
-    current_rsi = rsi_vals.iloc[-1]
-    current_price = close.iloc[-1]
+def macd_strategy(df: pd.DataFrame, engine: IndicatorEngine = None):
+    """MACD Based Strategy"""
+    engine = engine or IndicatorEngine.from_df(df)
+    macd_line, signal_line, histogram = engine.macd()
     
+    last_macd = macd_line[-1]
+    last_signal = signal_line[-1]
+    last_hist = histogram[-1]
+    prev_hist = histogram[-2] if len(histogram) > 1 else 0
+    
+    current_price = engine.close[-1]
+    return _macd_decision(current_price, last_macd, last_signal, last_hist, prev_hist)
+
+def _rsi_decision(current_price, current_rsi):
     if current_rsi < 30:
         tp, sl, roi_pct, rr = calculate_tp_sl(current_price, 'BUY')
         return 'BUY', current_price, tp, sl, roi_pct, rr
@@ -130,96 +118,233 @@ def rsi_strategy(df: pd.DataFrame):
     else:
         return 'NEUTRAL', current_price, current_price * 1.01, current_price * 0.99, 0, 0
 
+def rsi_strategy(df: pd.DataFrame, engine: IndicatorEngine = None):
+    """RSI Based Strategy (Overbought/Oversold)"""
+    engine = engine or IndicatorEngine.from_df(df)
+    current_rsi = engine.rsi(14)[-1]
+    current_price = engine.close[-1]
+    return _rsi_decision(current_price, current_rsi)
+
+def stream_strategy(strategy_name: str, state: StreamingIndicators):
+    """Та сама логіка стратегій, але на потоковому стані індикаторів (O(1) на свічку)"""
+    price = state.close
+    if strategy_name == 'keltner_breakout':
+        _, _, upper, lower = state.keltner.value
+        return _keltner_decision(price, upper, lower)
+    if strategy_name == 'macd':
+        last_macd, last_signal, last_hist = state.macd.value
+        prev_hist = state.macd.prev_histogram
+        return _macd_decision(price, last_macd, last_signal, last_hist, 0 if pd.isna(prev_hist) else prev_hist)
+    return _rsi_decision(price, state.rsi.value)
+
+
+def prepare_strategy(strategy_name: str, engine: IndicatorEngine):
+    """Рахує (і кешує в engine) ряди, які читає стратегія, — щоб етап strategy міряв лише рішення"""
+    if strategy_name == 'keltner_breakout':
+        engine.keltner(20, 2.0)
+    elif strategy_name == 'macd':
+        engine.macd()
+    else:  # rsi
+        engine.rsi(14)
+
 
 def generate_chart_image(df: pd.DataFrame):
     try:
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.plot(df['ts'], df['close'], linewidth=2.5, color='#00BCD4', label='Ціна')
-        ax.fill_between(df['ts'], df['low'], df['high'], alpha=0.1, color='#00BCD4')
-        ax.set_ylabel('Ціна (USDT)', fontsize=11, fontweight='bold')
-        ax.set_xlabel('Час', fontsize=11, fontweight='bold')
-        ax.set_title('Аналіз ринку в реальному часі', fontsize=13, fontweight='bold')
-        ax.grid(True, alpha=0.2, linestyle='--')
-        ax.legend(fontsize=10)
-        
-        fig.patch.set_facecolor('#1a1a1a')
-        ax.set_facecolor('#0d0d0d')
-        ax.tick_params(colors='#ffffff')
-        ax.xaxis.label.set_color('#ffffff')
-        ax.yaxis.label.set_color('#ffffff')
-        ax.title.set_color('#ffffff')
-        
-        buf = BytesIO()
-        fig.tight_layout()
-        fig.savefig(buf, format='png', dpi=100, facecolor='#1a1a1a')
-        buf.seek(0)
-        plt.close(fig)
-        return buf
+        # Фігура-шаблон створюється раз на процес, тут лише оновлюються дані
+        return BytesIO(render_png(df))
     except Exception as e:
         logger.error(f"Chart generation error: {e}")
         raise
 
 
-def generate_signal_message(symbol='BTC/USDT', timeframe=None, use_gemini=False):
-    """Генерує сигнал з випадковою стратегією та таймфреймом"""
+TIMEFRAMES = ['1h', '4h', '1d']
+STRATEGIES = ['keltner_breakout', 'macd', 'rsi']
+
+
+def format_signal_message(symbol, timeframe, strategy_name, result, atr_val, rsi_val, ma_20, current_price):
+    """Текст сигналу. result — кортеж стратегії (signal_type, entry, tp, sl, roi_pct, rr)"""
+    signal_type, entry, tp, sl, roi_pct, rr = result
+    trend = "📉 Down" if current_price < ma_20 else "📈 Up"
+    
+    signal_icon = "🔼" if signal_type == "BUY" else "🔽" if signal_type == "SELL" else "⚪"
+    
+    # Замість обчислення ROI від значень повторно — використовуємо roi_pct та rr
+    if signal_type == 'BUY':
+        roi_display = roi_pct
+    elif signal_type == 'SELL':
+        roi_display = roi_pct
+    else:
+        roi_display = 0
+
+    msg = []
+    msg.append(f"📊 {symbol} {timeframe.upper()}")
+    msg.append(f"🧠 Strategy: {strategy_name}")
+    msg.append(f"{signal_icon} Signal: {signal_type}")
+    msg.append(f"💵 Entry: {entry:.4f}")
+    msg.append(f"🎯 TP: {tp:.4f} (ROI: +{roi_display}% | RR: {rr}:1)")
+    msg.append(f"🛑 SL: {sl:.4f} (Risk: -2%)")
+    msg.append(f"🕒 {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC")
+    msg.append(f"📏 ATR: {atr_val}")
+    msg.append("")
+    msg.append(f"📊 {symbol.split('/')[0]} ({timeframe.upper()}): {trend}")
+    msg.append(f"RSI: {rsi_val} | Trend: {'Bullish ⬆️' if current_price > ma_20 else 'Bearish ⬇️'}")
+    return '\n'.join(msg)
+
+
+@dataclass(slots=True)
+class Signal:
+    """Результат стратегії. Текст і графік будуються ліниво — лише для тих сигналів,
+    які справді надсилаються."""
+    symbol: str
+    timeframe: str
+    strategy: str
+    signal_type: str
+    entry: float
+    tp: float
+    sl: float
+    roi_pct: float
+    rr: int
+    indicators: dict  # atr, rsi, ma_20, price
+    chart: bytes = field(default=None, repr=False)  # PNG, коли вже відрендерено
+    chart_key: tuple = None  # ключ у chart_cache (для повторного file_id)
+
+    @property
+    def is_actionable(self) -> bool:
+        return self.signal_type != 'NEUTRAL'
+
+    def to_message(self) -> str:
+        ind = self.indicators
+        return format_signal_message(
+            self.symbol, self.timeframe, self.strategy,
+            (self.signal_type, self.entry, self.tp, self.sl, self.roi_pct, self.rr),
+            ind['atr'], ind['rsi'], ind['ma_20'], ind['price']
+        )
+
+    def chart_file(self) -> BytesIO:
+        """Новий BytesIO з PNG (кожне надсилання читає свій буфер)"""
+        return BytesIO(self.chart)
+
+
+def make_signal(symbol, timeframe, strategy_name, result, atr_val, rsi_val, ma_20, current_price) -> Signal:
+    signal_type, entry, tp, sl, roi_pct, rr = result
+    rsi_val = round(float(rsi_val), 1) if not pd.isna(rsi_val) else 50.0
+    return Signal(
+        symbol, timeframe, strategy_name, signal_type,
+        float(entry), float(tp), float(sl), roi_pct, rr,
+        {'atr': atr_val, 'rsi': rsi_val, 'ma_20': float(ma_20), 'price': float(current_price)}
+    )
+
+
+def generate_signal(symbol='BTC/USDT', timeframe=None, df=None, strategy_name=None) -> Signal:
+    """Рахує сигнал з випадковою (або заданою) стратегією без рендеру графіка.
+    Якщо df вже завантажено (наприклад, асинхронно) — біржу не викликаємо."""
     try:
         # Обрати випадковий таймфрейм
         if timeframe is None:
-            timeframe = random.choice(['1h', '4h', '1d'])
+            timeframe = random.choice(TIMEFRAMES)
         
         logger.info(f"🧠 AI: Starting signal generation for {symbol} ({timeframe})")
         
-        df = fetch_ohlcv(symbol, timeframe=timeframe, limit=300)
+        if df is None:
+            with metrics.SIGNAL_STAGES.time(stage='fetch', symbol=symbol, timeframe=timeframe):
+                df = fetch_ohlcv(symbol, timeframe=timeframe, limit=300)
         if df is None or len(df) < 2:
             raise ValueError(f"❌ Немає даних для {symbol}")
         
         # Обрати випадкову стратегію
-        strategy_name = random.choice(['keltner_breakout', 'macd', 'rsi'])
+        strategy_name = strategy_name or random.choice(STRATEGIES)
         logger.info(f"🧠 AI: Using strategy: {strategy_name}")
         
-        if strategy_name == 'keltner_breakout':
-            signal_type, entry, tp, sl, roi_pct, rr = keltner_breakout(df)
-        elif strategy_name == 'macd':
-            signal_type, entry, tp, sl, roi_pct, rr = macd_strategy(df)
-        else:  # rsi
-            signal_type, entry, tp, sl, roi_pct, rr = rsi_strategy(df)
-
+        # Один рушій індикаторів на df — стратегія і довідкові значення ділять проміжні ряди
+        # (у пулі процесів час етапів повертається батьківському процесу через workers)
+        labels = dict(symbol=symbol, timeframe=timeframe, strategy=strategy_name)
+        engine = IndicatorEngine.from_df(df)
         logger.info(f"🧠 AI: Computing indicators")
-        atr_val = atr(df, period=14)
-        rsi_val = rsi(df['close']).iloc[-1]
-        rsi_val = round(rsi_val, 1) if not pd.isna(rsi_val) else 50.0
-        
-        ma_20 = df['close'].rolling(20).mean().iloc[-1]
-        current_price = df['close'].iloc[-1]
-        trend = "📉 Down" if current_price < ma_20 else "📈 Up"
-        
-        signal_icon = "🔼" if signal_type == "BUY" else "🔽" if signal_type == "SELL" else "⚪"
-        
-        # Замість обчислення ROI від значень повторно — використовуємо roi_pct та rr
-        if signal_type == 'BUY':
-            roi_display = roi_pct
-        elif signal_type == 'SELL':
-            roi_display = roi_pct
-        else:
-            roi_display = 0
-
-        msg = []
-        msg.append(f"📊 {symbol} {timeframe.upper()}")
-        msg.append(f"🧠 Strategy: {strategy_name}")
-        msg.append(f"{signal_icon} Signal: {signal_type}")
-        msg.append(f"💵 Entry: {entry:.4f}")
-        msg.append(f"🎯 TP: {tp:.4f} (ROI: +{roi_display}% | RR: {rr}:1)")
-        msg.append(f"🛑 SL: {sl:.4f} (Risk: -2%)")
-        msg.append(f"🕒 {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC")
-        msg.append(f"📏 ATR: {atr_val}")
-        msg.append("")
-        msg.append(f"📊 {symbol.split('/')[0]} ({timeframe.upper()}): {trend}")
-        msg.append(f"RSI: {rsi_val} | Trend: {'Bullish ⬆️' if current_price > ma_20 else 'Bearish ⬇️'}")
-        
-        full_msg = '\n'.join(msg)
-        logger.info(f"✅ AI: Signal generated successfully with {strategy_name} (ROI: {roi_display}%)")
-        chart_buf = generate_chart_image(df)
-        return full_msg, chart_buf
+        with metrics.SIGNAL_STAGES.time(stage='indicators', **labels):
+            prepare_strategy(strategy_name, engine)
+            atr_val = atr(df, period=14, engine=engine)
+            rsi_val, ma_20 = engine.rsi(14)[-1], engine.sma(20)[-1]
+
+        # Ряди вже в кеші engine — тут лише рішення стратегії
+        with metrics.SIGNAL_STAGES.time(stage='strategy', **labels):
+            if strategy_name == 'keltner_breakout':
+                result = keltner_breakout(df, engine)
+            elif strategy_name == 'macd':
+                result = macd_strategy(df, engine)
+            else:  # rsi
+                result = rsi_strategy(df, engine)
+        signal = make_signal(symbol, timeframe, strategy_name, result, atr_val,
+                             rsi_val, ma_20, engine.close[-1])
+        logger.info(f"✅ AI: Signal generated with {strategy_name}: {signal.signal_type} (ROI: {signal.roi_pct}%)")
+        return signal
     except Exception as e:
         logger.error(f"❌ AI: Signal generation FAILED - {type(e).__name__} - {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+def generate_signal_message(symbol='BTC/USDT', timeframe=None, use_gemini=False, df=None):
+    """Сумісний інтерфейс: (текст, графік) — графік рендериться завжди"""
+    if timeframe is None:
+        timeframe = random.choice(TIMEFRAMES)
+    if df is None:
+        with metrics.SIGNAL_STAGES.time(stage='fetch', symbol=symbol, timeframe=timeframe):
+            df = fetch_ohlcv(symbol, timeframe=timeframe, limit=300)
+    signal = generate_signal(symbol, timeframe, df=df)
+    with metrics.SIGNAL_STAGES.time(stage='chart', symbol=symbol, timeframe=timeframe):
+        chart = generate_chart_image(df)
+    return signal.to_message(), chart
+
+
+async def render_chart(signal: Signal, df) -> Signal:
+    """Рендерить графік сигналу в пулі процесів, якщо його ще немає.
+    Однаковий графік (символ, таймфрейм, остання свічка) береться з chart_cache."""
+    if signal.chart is None:
+        key = chart_cache.chart_key(signal.symbol, signal.timeframe, df)
+        png = chart_cache.get_png(key)
+        if png is None:
+            with metrics.SIGNAL_STAGES.time(stage='chart', symbol=signal.symbol, timeframe=signal.timeframe):
+                png = (await run_cpu(generate_chart_image, df)).getvalue()
+            chart_cache.put_png(key, png)
+        signal.chart, signal.chart_key = png, key
+    return signal
+
+
+async def find_signal(symbols, timeframe=None, max_concurrency=FETCH_CONCURRENCY, best=False):
+    """Паралельно завантажує свічки для символів і шукає не-NEUTRAL сигнал.
+    Повертає Signal (з графіком) першого знайденого сигналу (або з найбільшим RR,
+    якщо best=True) чи None, якщо всі NEUTRAL / з помилками."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def evaluate(sym):
+        tf = timeframe or random.choice(TIMEFRAMES)
+        async with semaphore:
+            with metrics.SIGNAL_STAGES.time(stage='fetch', symbol=sym, timeframe=tf):
+                df = await fetch_ohlcv_async(sym, timeframe=tf, limit=300)
+        # Індикатори рахуються в пулі процесів, а не в event loop бота
+        signal = await run_cpu(generate_signal, sym, tf, df)
+        return signal, df
+
+    tasks = [asyncio.ensure_future(evaluate(sym)) for sym in symbols]
+    found = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                signal, df = await next_done
+            except Exception as e:
+                logger.warning(f"⚠️ Symbol search failed: {type(e).__name__} - {e}")
+                continue
+            if not signal.is_actionable:
+                logger.info(f"⏭️ Signal {signal.symbol} is NEUTRAL, skipping...")
+                continue
+            if not best:
+                # Графік — лише для сигналу, який буде надіслано
+                return await render_chart(signal, df)
+            found.append((signal, df))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not found:
+        return None
+    signal, df = max(found, key=lambda item: item[0].rr)
+    return await render_chart(signal, df)
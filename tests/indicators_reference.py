@@ -0,0 +1,108 @@
+"""Початкові pandas-реалізації індикаторів і стратегій (signal_generator до IndicatorEngine).
+Еталон для перевірки, що векторизований і потоковий варіанти дають ті самі числа."""
+import numpy as np
+import pandas as pd
+
+from signal_generator import calculate_tp_sl
+
+
+def rsi(series: pd.Series, period: int = 14) -> pd.Series:
+    delta = series.diff()
+    gain = delta.clip(lower=0).fillna(0)
+    loss = -delta.clip(upper=0).fillna(0)
+    avg_gain = gain.rolling(period).mean()
+    avg_loss = loss.rolling(period).mean()
+    rs = avg_gain / (avg_loss + 1e-9)
+    return 100 - (100 / (1 + rs))
+
+
+def atr(df: pd.DataFrame, period: int = 14) -> float:
+    df['tr'] = np.maximum(
+        df['high'] - df['low'],
+        np.maximum(
+            abs(df['high'] - df['close'].shift(1)),
+            abs(df['low'] - df['close'].shift(1))
+        )
+    )
+    atr_val = df['tr'].rolling(period).mean().iloc[-1]
+    return round(atr_val, 8)
+
+
+def keltner_columns(df: pd.DataFrame, period: int = 20, atr_mult: float = 2.0):
+    """(ma, atr, upper, lower) — колонки, які keltner_breakout дописує в df"""
+    ma = df['close'].rolling(period).mean()
+    band = df['high'].rolling(period).apply(
+        lambda arr: float(np.mean(np.diff(arr))) if len(arr) > 1 else 0.0,
+        raw=True
+    )
+    return ma, band, ma + band * atr_mult, ma - band * atr_mult
+
+
+def keltner_breakout(df: pd.DataFrame):
+    df['ma'], df['atr'], df['upper'], df['lower'] = keltner_columns(df)
+    close = df['close'].iloc[-1]
+    upper = df['upper'].iloc[-1]
+    lower = df['lower'].iloc[-1]
+    if close > upper:
+        tp, sl, roi_pct, rr = calculate_tp_sl(close, 'BUY')
+        return 'BUY', close, tp, sl, roi_pct, rr
+    elif close < lower:
+        tp, sl, roi_pct, rr = calculate_tp_sl(close, 'SELL')
+        return 'SELL', close, tp, sl, roi_pct, rr
+    else:
+        return 'NEUTRAL', close, close * 1.01, close * 0.99, 0, 0
+
+
+def macd(series: pd.Series, fast=12, slow=26, signal=9):
+    ema_fast = series.ewm(span=fast).mean()
+    ema_slow = series.ewm(span=slow).mean()
+    macd_line = ema_fast - ema_slow
+    signal_line = macd_line.ewm(span=signal).mean()
+    histogram = macd_line - signal_line
+    return macd_line, signal_line, histogram
+
+
+def macd_strategy(df: pd.DataFrame):
+    close = df['close']
+    macd_line, signal_line, histogram = macd(close)
+    last_macd = macd_line.iloc[-1]
+    last_signal = signal_line.iloc[-1]
+    last_hist = histogram.iloc[-1]
+    prev_hist = histogram.iloc[-2] if len(histogram) > 1 else 0
+    current_price = close.iloc[-1]
+    if last_macd > last_signal and prev_hist < 0 and last_hist > 0:
+        tp, sl, roi_pct, rr = calculate_tp_sl(current_price, 'BUY')
+        return 'BUY', current_price, tp, sl, roi_pct, rr
+    elif last_macd < last_signal and prev_hist > 0 and last_hist < 0:
+        tp, sl, roi_pct, rr = calculate_tp_sl(current_price, 'SELL')
+        return 'SELL', current_price, tp, sl, roi_pct, rr
+    else:
+        return 'NEUTRAL', current_price, current_price * 1.01, current_price * 0.99, 0, 0
+
+
+def rsi_strategy(df: pd.DataFrame):
+    close = df['close']
+    current_rsi = rsi(close, period=14).iloc[-1]
+    current_price = close.iloc[-1]
+    if current_rsi < 30:
+        tp, sl, roi_pct, rr = calculate_tp_sl(current_price, 'BUY')
+        return 'BUY', current_price, tp, sl, roi_pct, rr
+    elif current_rsi > 70:
+        tp, sl, roi_pct, rr = calculate_tp_sl(current_price, 'SELL')
+        return 'SELL', current_price, tp, sl, roi_pct, rr
+    else:
+        return 'NEUTRAL', current_price, current_price * 1.01, current_price * 0.99, 0, 0
+
+
+def ohlcv(rows: int, base: float = 30000.0, seed: int = 0) -> pd.DataFrame:
+    """Синтетичні свічки: випадкове блукання з пласкими ділянками (delta = 0)"""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.01, rows)
+    steps[rng.random(rows) < 0.05] = 0.0
+    close = base * np.exp(np.cumsum(steps))
+    spread = close * rng.random(rows) * 0.01
+    return pd.DataFrame({
+        'ts': pd.date_range('2024-01-01', periods=rows, freq='h'),
+        'open': close, 'high': close + spread, 'low': close - spread,
+        'close': close, 'volume': rng.random(rows) * 10,
+    })
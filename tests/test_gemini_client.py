@@ -0,0 +1,208 @@
+"""AsyncGeminiClient проти локального HTTP-замінника Gemini API (aiohttp.test_utils)"""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import gemini_client as gc
+
+OK = (200, {'candidates': [{'content': {'parts': [{'text': 'ok'}]}}]})
+
+
+class StubGemini:
+    """Відповідає за сценарієм responses [(status, body)]; останню відповідь повторює"""
+
+    def __init__(self, responses, delay: float = 0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.calls = 0
+
+    async def handle(self, request):
+        self.calls += 1
+        await request.json()
+        await asyncio.sleep(self.delay)
+        status, body = self.responses[min(self.calls, len(self.responses)) - 1]
+        return web.json_response(body, status=status)
+
+
+def run(stub, scenario, **kwargs):
+    """scenario(client) на клієнті, спрямованому на stub"""
+    kwargs.setdefault('deadline', 5.0)
+    kwargs.setdefault('max_retries', 0)
+
+    async def main():
+        app = web.Application()
+        app.router.add_post('/models/{model}', stub.handle)
+        async with TestServer(app) as server:
+            client = gc.AsyncGeminiClient(api_key='test', base_url=str(server.make_url('')), model='stub', **kwargs)
+            try:
+                return await scenario(client)
+            finally:
+                await client.close()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(gc.random, 'uniform', lambda a, b: 0.01)
+
+
+def test_cache_hit():
+    stub = StubGemini([OK])
+
+    async def scenario(client):
+        first = await client.generate('ціна  BTC', '1h')
+        second = await client.generate('ціна BTC', '1h')  # той самий промпт після нормалізації пробілів
+        return first, second, client.stats
+
+    first, second, stats = run(stub, scenario)
+    assert first == second == 'ok'
+    assert stub.calls == 1
+    assert stats['requests'] == 2 and stats['api_calls'] == 1
+
+
+def test_identical_prompts_are_coalesced():
+    stub = StubGemini([OK], delay=0.1)
+
+    async def scenario(client):
+        return await asyncio.gather(*(client.generate('same') for _ in range(5))), client.stats
+
+    texts, stats = run(stub, scenario)
+    assert texts == ['ok'] * 5
+    assert stub.calls == 1
+    assert stats['coalesced'] == 4
+
+
+def test_cancelled_owner_does_not_cancel_coalesced_callers():
+    stub = StubGemini([OK], delay=0.1)
+
+    async def scenario(client):
+        owner = asyncio.create_task(client.generate('same'))
+        await asyncio.sleep(0.02)
+        other = asyncio.create_task(client.generate('same'))
+        await asyncio.sleep(0.02)
+        owner.cancel()
+        return await other, client._inflight
+
+    text, inflight = run(stub, scenario)
+    assert text == 'ok'
+    assert inflight == {}
+
+
+def test_retries_5xx_and_429(fast_backoff):
+    stub = StubGemini([(503, {}), (429, {}), (500, {}), OK])
+
+    async def scenario(client):
+        return await client.generate('retry'), client.stats, client.breaker.state
+
+    text, stats, state = run(stub, scenario, max_retries=3, breaker=gc.CircuitBreaker(threshold=2))
+    assert text == 'ok'
+    assert stub.calls == 4
+    assert stats['retries'] == 3 and stats['failures'] == 0
+    assert state == 'closed'
+
+
+def test_retries_stop_at_deadline():
+    stub = StubGemini([(503, {})])
+
+    async def scenario(client):
+        started = time.monotonic()
+        with pytest.raises((gc.GeminiError, asyncio.TimeoutError)):
+            await client.generate('slow')
+        return time.monotonic() - started
+
+    elapsed = run(stub, scenario, deadline=0.5, max_retries=100)
+    assert elapsed < 0.5 + 0.25
+    assert stub.calls >= 1
+
+
+def test_breaker_opens_and_recovers_via_half_open():
+    stub = StubGemini([(503, {}), (503, {}), OK])
+    breaker = gc.CircuitBreaker(threshold=2, reset_timeout=0.1)
+
+    async def scenario(client):
+        for prompt in ('a', 'b'):
+            with pytest.raises(gc.GeminiError):
+                await client.generate(prompt)
+        assert breaker.state == 'open'
+        with pytest.raises(gc.CircuitOpen):
+            await client.generate('c')
+        assert stub.calls == 2  # розімкнений breaker не пускає запит на сервер
+        await asyncio.sleep(0.12)
+        assert breaker.state == 'half-open'
+        return await client.generate('d')
+
+    assert run(stub, scenario, breaker=breaker) == 'ok'
+    assert breaker.state == 'closed' and breaker.failures == 0
+    assert stub.calls == 3
+
+
+def test_failed_half_open_trial_reopens():
+    stub = StubGemini([(503, {})])
+    breaker = gc.CircuitBreaker(threshold=1, reset_timeout=0.1)
+
+    async def scenario(client):
+        with pytest.raises(gc.GeminiError):
+            await client.generate('a')
+        await asyncio.sleep(0.12)
+        with pytest.raises(gc.GeminiError):
+            await client.generate('b')  # пробний запит
+        return breaker.state
+
+    assert run(stub, scenario, breaker=breaker) == 'open'
+    assert stub.calls == 2
+
+
+def test_4xx_is_neutral_for_breaker():
+    stub = StubGemini([(503, {}), (400, {}), (400, {})])
+    breaker = gc.CircuitBreaker(threshold=2, reset_timeout=0.1)
+
+    async def scenario(client):
+        with pytest.raises(gc.GeminiError):
+            await client.generate('a')
+        with pytest.raises(gc.GeminiError):
+            await client.generate('b')
+        assert breaker.failures == 1 and breaker.state == 'closed'  # 4xx не скидає і не додає збоїв
+        breaker.record_failure()
+        await asyncio.sleep(0.12)
+        with pytest.raises(gc.GeminiError):
+            await client.generate('c')  # пробний запит з 4xx — без вердикту
+        return breaker.state, breaker.allow()
+
+    assert run(stub, scenario, breaker=breaker) == ('half-open', True)
+
+
+@pytest.mark.parametrize('body', ({'candidates': []}, [1, 2], {'candidates': [{'content': {'parts': ['x']}}]}))
+def test_malformed_response_does_not_stick_half_open(body):
+    stub = StubGemini([(200, body)])
+    breaker = gc.CircuitBreaker(threshold=1, reset_timeout=0.05)
+
+    async def scenario(client):
+        breaker.record_failure()
+        await asyncio.sleep(0.06)
+        with pytest.raises(gc.GeminiError):
+            await client.generate('trial')
+        await asyncio.sleep(0.06)
+        return breaker.allow()
+
+    assert run(stub, scenario, breaker=breaker) is True
+
+
+def test_cancelled_trial_releases_half_open():
+    stub = StubGemini([OK], delay=0.5)
+    breaker = gc.CircuitBreaker(threshold=1, reset_timeout=0.05)
+
+    async def scenario(client):
+        breaker.record_failure()
+        await asyncio.sleep(0.06)
+        trial = asyncio.create_task(client._call('trial'))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        return breaker.allow()
+
+    assert run(stub, scenario, breaker=breaker) is True
@@ -0,0 +1,69 @@
+"""IndicatorEngine і функції signal_generator проти початкових pandas-реалізацій"""
+import numpy as np
+import pytest
+
+import signal_generator as sg
+from indicators import IndicatorEngine
+import indicators_reference as ref
+
+SIZES = (30, 300, 5_000, 50_000)
+BASES = (30000.0, 0.0005)
+RTOL = 1e-7
+
+
+def _close(actual, expected, scale=1.0):
+    np.testing.assert_allclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float),
+                               rtol=RTOL, atol=RTOL * scale)
+
+
+@pytest.mark.parametrize('base', BASES)
+@pytest.mark.parametrize('rows', SIZES)
+def test_rsi_matches_reference(rows, base):
+    df = ref.ohlcv(rows, base)
+    _close(sg.rsi(df['close']), ref.rsi(df['close']), scale=100)
+
+
+@pytest.mark.parametrize('base', BASES)
+@pytest.mark.parametrize('rows', SIZES)
+def test_atr_matches_reference(rows, base):
+    df, expected_df = ref.ohlcv(rows, base), ref.ohlcv(rows, base)
+    expected = ref.atr(expected_df)
+    assert sg.atr(df) == pytest.approx(expected, rel=RTOL, abs=1e-8)
+    # atr() свідомо зберігає контракт початкової версії: колонка tr дописується в df
+    _close(df['tr'], expected_df['tr'], scale=base)
+    _close(IndicatorEngine.from_df(df).atr(14), expected_df['tr'].rolling(14).mean(), scale=base)
+
+
+@pytest.mark.parametrize('base', BASES)
+@pytest.mark.parametrize('rows', SIZES)
+def test_macd_matches_reference(rows, base):
+    df = ref.ohlcv(rows, base)
+    for actual, expected in zip(sg.macd(df['close']), ref.macd(df['close'])):
+        _close(actual, expected, scale=base)
+
+
+@pytest.mark.parametrize('base', BASES)
+@pytest.mark.parametrize('rows', SIZES)
+def test_keltner_columns_match_reference(rows, base):
+    df = ref.ohlcv(rows, base)
+    sg.keltner_breakout(df)
+    expected = ref.keltner_columns(ref.ohlcv(rows, base))
+    for column, values in zip(('ma', 'atr', 'upper', 'lower'), expected):
+        _close(df[column], values, scale=base)
+
+
+@pytest.mark.parametrize('strategy', ['keltner_breakout', 'macd_strategy', 'rsi_strategy'])
+@pytest.mark.parametrize('base', BASES)
+def test_strategy_decisions_match_reference(strategy, base):
+    df = ref.ohlcv(1500, base, seed=7)
+    actual_fn, expected_fn = getattr(sg, strategy), getattr(ref, strategy)
+    decisions = set()
+    for end in range(30, len(df) + 1, 7):
+        window = df.iloc[:end]
+        actual = actual_fn(window.copy())
+        expected = expected_fn(window.copy())
+        # TP/SL залежать від випадкового RR — порівнюємо рішення і ціну входу
+        assert actual[0] == expected[0], f'{strategy} at {end}'
+        assert actual[1] == pytest.approx(expected[1], rel=1e-12)
+        decisions.add(actual[0])
+    assert decisions - {'NEUTRAL'}, 'вікна мають містити і не-NEUTRAL рішення'
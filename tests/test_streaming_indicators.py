@@ -0,0 +1,67 @@
+"""Потокові індикатори (seed + update + revise) проти IndicatorEngine на тій самій історії"""
+import numpy as np
+import pytest
+
+from indicators import IndicatorEngine, StreamingIndicators, RSI
+import indicators_reference as ref
+
+RTOL = 1e-9
+
+
+def _close(actual, expected, scale):
+    np.testing.assert_allclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float),
+                               rtol=RTOL, atol=RTOL * scale)
+
+
+def _live_candles(df, history: int, revisions: int, seed: int):
+    """Після history свічок: кожна нова свічка приходить спершу чернеткою,
+    далі revisions оновлень незакритої свічки, останнє — справжні значення"""
+    rng = np.random.default_rng(seed)
+    for i in range(history, len(df)):
+        high, low, close = df['high'].iat[i], df['low'].iat[i], df['close'].iat[i]
+        for step in range(revisions + 1):
+            if step == revisions:
+                yield i, step, high, low, close
+            else:
+                jitter = 1 + rng.normal(0, 0.003)
+                yield i, step, high * jitter, low * jitter, close * jitter
+
+
+@pytest.mark.parametrize('base', (30000.0, 0.0005))
+@pytest.mark.parametrize('history', (1, 40, 300))
+def test_streaming_matches_engine_with_revisions(history, base):
+    df = ref.ohlcv(history + 120, base, seed=3)
+    highs, lows, closes = (df[c].to_numpy().copy() for c in ('high', 'low', 'close'))
+    state = StreamingIndicators.from_df(df.iloc[:history])
+    wilder = RSI(14, wilder=True).seed(closes[:history])
+
+    for i, step, high, low, close in _live_candles(df, history, revisions=3, seed=history):
+        if step == 0:
+            state.update(high, low, close, df['ts'].iat[i])
+            wilder.update(close)
+        else:
+            state.revise(high, low, close)
+            wilder.revise(close)
+        highs[i], lows[i], closes[i] = high, low, close
+        engine = IndicatorEngine(closes[:i + 1], highs[:i + 1], lows[:i + 1])
+
+        _close(state.rsi.value, engine.rsi(14)[-1], 100)
+        _close(wilder.value, engine.rsi_wilder(14)[-1], 100)
+        _close(state.atr.value, engine.atr(14)[-1], base)
+        _close(state.ma_20.value, engine.sma(20)[-1], base)
+        line, signal, hist = engine.macd()
+        _close(state.macd.value, (line[-1], signal[-1], hist[-1]), base)
+        if i > 0:
+            _close(state.macd.prev_histogram, hist[-2], base)
+        _close(state.keltner.value, [values[-1] for values in engine.keltner(20, 2.0)], base)
+
+
+def test_apply_revises_same_timestamp():
+    df = ref.ohlcv(100, seed=5)
+    state = StreamingIndicators.from_df(df)
+    closes = df['close'].to_numpy().copy()
+    closes[-1] *= 1.01
+    state.apply(df['high'].iat[-1], df['low'].iat[-1], closes[-1], df['ts'].iat[-1])
+    engine = IndicatorEngine(closes, df['high'].to_numpy(), df['low'].to_numpy())
+    _close(state.rsi.value, engine.rsi(14)[-1], 100)
+    _close(state.ma_20.value, engine.sma(20)[-1], closes[-1])
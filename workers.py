@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import metrics
+from config import CPU_WORKERS, IO_WORKERS, WORKER_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerQueueFull(RuntimeError):
+    """Черга пулу переповнена — нову задачу не прийнято"""
+
+
+def _timed_call(fn, args, kwargs):
+    # time.monotonic спільний для всіх процесів на одній машині,
+    # тому час старту з воркера можна порівнювати з часом постановки в чергу
+    started = time.monotonic()
+    result = fn(*args, **kwargs)
+    # Спани, записані в процесі пулу, їдуть назад разом із результатом
+    return started, time.monotonic(), result, metrics.drain_forwarded()
+
+
+class WorkerPool:
+    """Пул виконавців з обмеженою чергою і статистикою очікування/виконання"""
+
+    def __init__(self, name: str, executor_factory, max_workers: int, queue_depth: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.queue_depth = max(0, queue_depth)
+        self._executor_factory = executor_factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = 0  # виконуються + чекають у черзі
+        self.stats = {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+            'wait_total': 0.0, 'wait_max': 0.0, 'run_total': 0.0, 'run_max': 0.0
+        }
+        self.recent = deque(maxlen=100)  # (назва задачі, очікування, виконання)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = self._executor_factory(self.max_workers)
+        return self._executor
+
+    async def submit(self, fn, *args, **kwargs):
+        """Виконує fn у пулі та чекає на результат, не блокуючи event loop"""
+        with self._lock:
+            if self._active >= self.max_workers + self.queue_depth:
+                self.stats['rejected'] += 1
+                raise WorkerQueueFull(f"{self.name}: черга заповнена ({self._active})")
+            self._active += 1
+            self.stats['submitted'] += 1
+
+        job_name = getattr(fn, '__name__', repr(fn))
+        queued = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            started, finished, result, observed = await loop.run_in_executor(
+                self._get_executor(), functools.partial(_timed_call, fn, args, kwargs)
+            )
+        except Exception:
+            with self._lock:
+                self.stats['failed'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+
+        metrics.record_forwarded(observed)
+        wait, run = max(0.0, started - queued), finished - started
+        with self._lock:
+            self.stats['completed'] += 1
+            self.stats['wait_total'] += wait
+            self.stats['run_total'] += run
+            self.stats['wait_max'] = max(self.stats['wait_max'], wait)
+            self.stats['run_max'] = max(self.stats['run_max'], run)
+            self.recent.append((job_name, wait, run))
+        logger.debug(f"⚙️ {self.name}: {job_name} wait={wait:.3f}s run={run:.3f}s")
+        return result
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats, active=self._active, workers=self.max_workers,
+                         queue_depth=self.queue_depth)
+            done = stats['completed'] or 1
+            stats['wait_avg'] = stats['wait_total'] / done
+            stats['run_avg'] = stats['run_total'] / done
+            stats['recent'] = list(self.recent)
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+# Процеси для CPU-задач (pandas, matplotlib). spawn — бо в батьківському процесі
+# вже працюють потоки й event loop, а fork їх не переносить коректно.
+cpu_pool = WorkerPool(
+    'cpu',
+    lambda n: ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context('spawn')),
+    CPU_WORKERS, WORKER_QUEUE_DEPTH
+)
+# Потоки для блокуючого I/O (синхронний ccxt, файли)
+io_pool = WorkerPool(
+    'io',
+    lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix='io-worker'),
+    IO_WORKERS, WORKER_QUEUE_DEPTH
+)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Виконати CPU-задачу в пулі процесів"""
+    return await cpu_pool.submit(fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    """Виконати блокуючу I/O-задачу в пулі потоків"""
+    return await io_pool.submit(fn, *args, **kwargs)
+
+
+def get_stats() -> dict:
+    return {'cpu': cpu_pool.get_stats(), 'io': io_pool.get_stats()}
+
+
+def shutdown(wait: bool = True):
+    cpu_pool.shutdown(wait=wait)
+    io_pool.shutdown(wait=wait)
+    logger.info("✅ Worker pools stopped")
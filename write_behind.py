@@ -0,0 +1,125 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def replace(old, new):
+    """Злиття за замовчуванням: новіше значення перекриває старе"""
+    return new
+
+
+def add(old, new):
+    """Злиття для лічильників-дельт"""
+    return old + new
+
+
+class WriteBehindBuffer:
+    """Відкладений запис: оновлення тримаються в пам'яті (повторні для того ж ключа
+    зливаються через merge) і скидаються однією пачкою flush_fn(items) —
+    раз на interval секунд, при перевищенні max_pending і при зупинці.
+
+    flush_fn отримує список (key, value) і має записати його однією транзакцією.
+    Якщо запис не вдався, значення повертаються в буфер і підуть з наступною пачкою."""
+
+    def __init__(self, name: str, flush_fn, interval: float = 5.0, max_pending: int = 500, merge=replace):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_pending = max(1, max_pending)
+        self.merge = merge
+        self._pending = {}
+        self._lock = threading.Lock()        # захищає _pending
+        self._flush_lock = threading.RLock()  # один flush одночасно; RLock — discard можна в paused()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.stats = {'updates': 0, 'merged': 0, 'flushes': 0, 'flushed': 0, 'failures': 0}
+
+    def _ensure_started(self):
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.name}', daemon=True)
+            self._thread.start()
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._pending:
+                self._pending[key] = self.merge(self._pending[key], value)
+                self.stats['merged'] += 1
+            else:
+                self._pending[key] = value
+            self.stats['updates'] += 1
+            full = len(self._pending) >= self.max_pending
+            self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def get(self, key, default=None):
+        """Значення, яке ще не записане в БД (для накладання при читанні)"""
+        with self._lock:
+            return self._pending.get(key, default)
+
+    def discard(self, key):
+        """Прибирає відкладене значення (коли його перекриває прямий запис у БД).
+        Чекає на flush, що саме виконується, щоб той не записав застаріле значення пізніше."""
+        with self._flush_lock, self._lock:
+            self._pending.pop(key, None)
+
+    def clear(self):
+        with self._flush_lock, self._lock:
+            self._pending.clear()
+
+    @contextmanager
+    def paused(self):
+        """Блок, під час якого flush не виконується: читання «рядок з БД + get()»
+        тоді бачить узгоджену картину (значення або ще в буфері, або вже в БД)"""
+        with self._flush_lock:
+            yield
+
+    def flush(self) -> int:
+        """Записує все накопичене однією пачкою; повертає кількість записів"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                items, self._pending = list(self._pending.items()), {}
+            try:
+                self.flush_fn(items)
+            except Exception as e:
+                with self._lock:
+                    # Новіші оновлення, що прийшли під час запису, зливаються поверх
+                    for key, value in items:
+                        if key in self._pending:
+                            self._pending[key] = self.merge(value, self._pending[key])
+                        else:
+                            self._pending[key] = value
+                    self.stats['failures'] += 1
+                logger.error(f"❌ Write-behind {self.name}: flush of {len(items)} failed - {type(e).__name__} - {e}")
+                return 0
+            with self._lock:
+                self.stats['flushes'] += 1
+                self.stats['flushed'] += len(items)
+            return len(items)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        """Зупиняє фоновий потік і скидає залишок"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        flushed = self.flush()
+        self._stopping = False
+        if flushed:
+            logger.info(f"✅ Write-behind {self.name}: flushed {flushed} pending updates on stop")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending))